@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from api.metrics import REGISTRY
+from config.settings import SCHEDULE_CACHE_TTL, SCHEDULE_CACHE_SIZE, STALE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleCache:
+    """
+    Общий для процесса кэш расписаний с TTL и вытеснением по LRU.
+    Одновременные промахи по одному ключу ждут один и тот же запрос к API.
+    Устаревшие значения (с признаком stale) живут stale_ttl, чтобы их скорее перепроверили.
+    """
+
+    def __init__(self, ttl: float = SCHEDULE_CACHE_TTL, maxsize: int = SCHEDULE_CACHE_SIZE, stale_ttl: float = STALE_TTL):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._listeners: List[Callable[[Hashable, Any], None]] = []
+        self._evict_listeners: List[Callable[[Hashable], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Возвращает значение из кэша, если оно ещё не устарело.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._evicted(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Кладёт значение в кэш, вытесняя самые давно использованные записи.
+        """
+        ttl = self.stale_ttl if getattr(value, "stale", False) else self.ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        evicted = []
+        while len(self._entries) > self.maxsize:
+            evicted.append(self._entries.popitem(last=False)[0])
+        for old_key in evicted:
+            self._evicted(old_key)
+        for listener in self._listeners:
+            try:
+                listener(key, value)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика обновления кэша для {key}: {e}")
+
+    def add_listener(self, listener: Callable[[Hashable, Any], None]):
+        """
+        Регистрирует функцию, которая вызывается при каждой записи нового значения.
+        """
+        self._listeners.append(listener)
+
+    def add_evict_listener(self, listener: Callable[[Hashable], None]):
+        """
+        Регистрирует функцию, которая вызывается, когда запись удаляется из кэша
+        (вытеснена, устарела или сброшена), чтобы производные данные не пережили её.
+        """
+        self._evict_listeners.append(listener)
+
+    def _evicted(self, key: Hashable):
+        for listener in self._evict_listeners:
+            try:
+                listener(key)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика удаления из кэша для {key}: {e}")
+
+    def expires_in(self, key: Hashable) -> float:
+        """
+        Сколько секунд осталось жить записи (0, если её нет или она устарела).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, entry[0] - time.monotonic())
+
+    def invalidate(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self._evicted(key)
+
+    def clear(self):
+        keys = list(self._entries)
+        self._entries.clear()
+        for key in keys:
+            self._evicted(key)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Возвращает значение из кэша или загружает его через loader.
+        Если загрузка по этому ключу уже идёт, присоединяется к ней.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        return await self._load(key, loader)
+
+    async def refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Загружает значение заново, не глядя в кэш, и обновляет запись.
+        Если загрузка по этому ключу уже идёт, присоединяется к ней.
+        """
+        return await self._load(key, loader)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug("Ожидаем уже идущий запрос для %s", key)
+        else:
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_loaded(key, t))
+
+        # shield: отмена одного обработчика не должна отменять общий запрос
+        return await asyncio.shield(task)
+
+    def _on_loaded(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        # exception() помечает ошибку как полученную, даже если ждать было некому
+        if task.exception() is None:
+            self.set(key, task.result())
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+schedule_cache = ScheduleCache()
+REGISTRY.stats("schedule_cache", "Статистика кэша расписаний", schedule_cache.stats)
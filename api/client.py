@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Any, Optional
+
+import aiohttp
+from yarl import URL
+
+from config.settings import (
+    BASE_URL, API_URL, HEADERS,
+    HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_KEEPALIVE_TIMEOUT,
+    COOKIE_MAX_AGE, UPSTREAM_RPS, UPSTREAM_BURST, UPSTREAM_RETRIES, UPSTREAM_HEDGE,
+)
+from api.ratelimit import RateLimiter
+from api.shared import create_upstream_limiter
+from api.resilience import CLOSED, CircuitBreaker, CircuitOpenError, LatencyTracker, backoff, hedged
+from api.metrics import REGISTRY, UPSTREAM_LATENCY, UPSTREAM_ERRORS, UPSTREAM_INFLIGHT, UPSTREAM_RETRIES_TOTAL
+
+logger = logging.getLogger(__name__)
+
+# Общий бюджет запросов к rasp.dmami.ru, чтобы сайт не забанил наш IP
+# (при нескольких процессах — общий для всех через SHARED_BACKEND)
+upstream_limiter = create_upstream_limiter(UPSTREAM_RPS, UPSTREAM_BURST)
+
+
+class UnexpectedResponseError(ValueError):
+    """
+    API вернул не JSON (обычно HTML-страницу вместо данных).
+    """
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Ошибки, после которых GET-запрос расписания имеет смысл повторить:
+    сеть, таймаут и 5xx/429. Остальные 4xx повторять бесполезно, а на не-JSON
+    _fetch_once уже обновил куки и повторил запрос сам: ещё круг повторов
+    только нагрузит сайт.
+    """
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status >= 500 or error.status == 429
+    return isinstance(error, (aiohttp.ClientError, TimeoutError))
+
+
+def describe_error(error: BaseException) -> str:
+    if isinstance(error, aiohttp.ClientResponseError):
+        return f"HTTP {error.status}"
+    return str(error) or type(error).__name__
+
+
+class ScheduleClient:
+    """
+    Асинхронный клиент API rasp.dmami.ru.
+    Держит одну долгоживущую aiohttp-сессию с пулом keep-alive соединений,
+    поэтому запросы разных пользователей не блокируют цикл событий.
+    Куки с главной страницы получаются один раз и переиспользуются,
+    пока не истекут или API не начнёт отвечать не-JSON.
+    Таймаут запроса подстраивается под наблюдаемую задержку сайта, временные
+    ошибки повторяются с паузой, а предохранитель перестаёт обращаться
+    к сайту, пока тот не отвечает.
+    """
+
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        api_url: str = API_URL,
+        timeout: float = HTTP_TIMEOUT,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+        limit: int = HTTP_POOL_LIMIT,
+        limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        cookie_max_age: float = COOKIE_MAX_AGE,
+        rate_limiter: Optional[RateLimiter] = None,
+        retries: int = UPSTREAM_RETRIES,
+        hedge: bool = UPSTREAM_HEDGE,
+        breaker: Optional[CircuitBreaker] = None,
+        latency: Optional[LatencyTracker] = None,
+    ):
+        self.base_url = base_url
+        self.api_url = api_url
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.connect_timeout = connect_timeout
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.cookie_max_age = cookie_max_age
+        self.rate_limiter = rate_limiter if rate_limiter is not None else upstream_limiter
+        self.retries = retries
+        self.hedge = hedge
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency or LatencyTracker(max_timeout=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._cookies_warmed_at: Optional[float] = None
+        self._had_cookies = False
+        self._warm_lock = asyncio.Lock()
+        self.stats = {"requests": 0, "warmups": 0, "refreshes": 0, "retries": 0, "rejected": 0}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Возвращает общую сессию, создавая её при первом обращении.
+        """
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self.timeout,
+                headers=HEADERS,
+            )
+            self._cookies_warmed_at = None
+        return self._session
+
+    def _cookies_expired(self) -> bool:
+        """
+        Проверяет, нужно ли заново получать куки с главной страницы.
+        """
+        if self._cookies_warmed_at is None:
+            return True
+        if time.monotonic() - self._cookies_warmed_at >= self.cookie_max_age:
+            return True
+        # Просроченные куки aiohttp сам убирает из cookie jar
+        if self._had_cookies and not self._session.cookie_jar.filter_cookies(URL(self.base_url)):
+            return True
+        return False
+
+    async def _warm_up(self, force: bool = False):
+        """
+        Получает куки с главной страницы, если их ещё нет или они устарели.
+        """
+        http = self._get_session()
+        warmed_at = self._cookies_warmed_at
+        async with self._warm_lock:
+            # Пока ждали блокировку, куки мог обновить другой запрос
+            if self._cookies_warmed_at != warmed_at:
+                return
+            if not force and not self._cookies_expired():
+                return
+
+            if self._cookies_warmed_at is None:
+                self.stats["warmups"] += 1
+                logger.info("Получаем куки с главной страницы...")
+            else:
+                self.stats["refreshes"] += 1
+                logger.info("Обновляем куки с главной страницы...")
+
+            await self.rate_limiter.acquire()
+            async with http.get(self.base_url) as response:
+                response.raise_for_status()
+                await response.read()
+
+            self._had_cookies = bool(http.cookie_jar.filter_cookies(URL(self.base_url)))
+            self._cookies_warmed_at = time.monotonic()
+
+    async def _request_schedule(self, params: Dict[str, str], timeout: float) -> Dict[str, Any]:
+        http = self._get_session()
+        self.stats["requests"] += 1
+        request_timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, self.connect_timeout))
+        async with http.get(self.api_url, params=params, timeout=request_timeout) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "")
+            text = await response.text()
+
+        if "application/json" not in content_type.lower():
+            logger.error("Сервер вернул не JSON: content_type=%s body=%.500s", content_type, text)
+            raise UnexpectedResponseError("Ожидался JSON, но получен другой формат")
+
+        data = json.loads(text)
+        if isinstance(data, str):
+            logger.warning("Данные получены как строка, пробуем распарсить ещё раз...")
+            data = json.loads(data)
+        return data
+
+    async def _send(self, group: str, params: Dict[str, str], sent: Optional[asyncio.Event]) -> Dict[str, Any]:
+        """
+        Один запрос расписания. Таймаут, замер задержки и окно дублирующего запроса
+        отсчитываются с момента, когда лимит выдал токен: ожидание в собственной
+        очереди ничего не говорит о скорости сайта. Дублирующий запрос отправляется,
+        только если свободный токен есть сразу, поэтому он не ждёт в очереди
+        и не расходует лимит зря.
+        """
+        await self.rate_limiter.acquire()
+        if sent is not None:
+            sent.set()
+        timeout = self.latency.timeout()
+        delay = self.latency.hedge_delay() if self.hedge else None
+        logger.debug("upstream_fetch group=%s session=%s timeout=%.1f", group, params["session"], timeout)
+        started = time.perf_counter()
+        data = await hedged(lambda: self._request_schedule(params, timeout), delay, self.rate_limiter.try_acquire)
+        self.latency.observe(time.perf_counter() - started)
+        return data
+
+    async def _fetch_once(self, group: str, params: Dict[str, str], sent: Optional[asyncio.Event]) -> Dict[str, Any]:
+        await self._warm_up()
+        try:
+            return await self._send(group, params, sent)
+        except UnexpectedResponseError:
+            # Обычно так сайт отвечает на устаревшие куки: обновляем и повторяем один раз
+            logger.warning(f"API вернул не JSON для группы {group}, обновляем куки")
+            await self._warm_up(force=True)
+            return await self._send(group, params, sent)
+
+    async def _fetch_with_retries(self, group: str, params: Dict[str, str], sent: Optional[asyncio.Event]) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            self.breaker.before_request()
+            try:
+                data = await self._fetch_once(group, params, sent)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.retries or self.breaker.state != CLOSED:
+                    raise
+                attempt += 1
+                pause = backoff(attempt)
+                self.stats["retries"] += 1
+                UPSTREAM_RETRIES_TOTAL.inc(kind="retry")
+                logger.warning(f"Ошибка запроса расписания группы {group}: {describe_error(e)}, "
+                               f"повтор {attempt} через {pause:.2f} с")
+                await asyncio.sleep(pause)
+                continue
+
+            self.breaker.record_success()
+            return data
+
+    async def fetch_schedule(self, group: str, session: str = "0", sent: Optional[asyncio.Event] = None) -> Dict[str, Any]:
+        """
+        Получает расписание для заданной группы, не блокируя цикл событий.
+        sent устанавливается, когда запрос дождался очереди в лимите и уходит на сайт.
+        """
+        params = {"group": group, "session": session}
+        UPSTREAM_INFLIGHT.inc()
+        started = time.perf_counter()
+
+        try:
+            return await self._fetch_with_retries(group, params, sent)
+
+        except CircuitOpenError as e:
+            self.stats["rejected"] += 1
+            UPSTREAM_ERRORS.inc(kind="circuit_open")
+            logger.warning(f"Запрос группы {group} не отправлен: {e}")
+            raise
+        except aiohttp.ClientResponseError as e:
+            UPSTREAM_ERRORS.inc(kind="http")
+            logger.error(f"HTTP ошибка: {e.message} (Код: {e.status})")
+            raise
+        except ValueError as e:
+            UPSTREAM_ERRORS.inc(kind="parse")
+            logger.error(f"Ошибка парсинга JSON: {e}")
+            raise
+        except aiohttp.ClientError as e:
+            UPSTREAM_ERRORS.inc(kind="network")
+            logger.error(f"Ошибка запроса: {e}")
+            raise
+        except TimeoutError:
+            UPSTREAM_ERRORS.inc(kind="timeout")
+            logger.error(f"Превышено время ожидания ответа для группы {group}")
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            UPSTREAM_INFLIGHT.dec()
+            UPSTREAM_LATENCY.observe(elapsed)
+            logger.debug("upstream_done group=%s elapsed=%.3f", group, elapsed)
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            **self.stats,
+            "timeout": round(self.latency.timeout(), 3),
+            "circuit_state": self.breaker.get_stats()["state"],
+            "circuit_failures": self.breaker.failures,
+        }
+
+    async def close(self):
+        """
+        Закрывает сессию и все соединения пула.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._cookies_warmed_at = None
+
+
+_client: Optional[ScheduleClient] = None
+
+
+def get_client() -> ScheduleClient:
+    """
+    Возвращает общий для всего процесса экземпляр клиента.
+    """
+    global _client
+    if _client is None:
+        _client = ScheduleClient()
+    return _client
+
+
+async def close_client():
+    """
+    Закрывает общий клиент при остановке бота.
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+REGISTRY.stats(
+    "schedule_client", "Статистика HTTP-клиента rasp.dmami.ru",
+    lambda: _client.get_stats() if _client is not None else {},
+)
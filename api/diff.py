@@ -0,0 +1,135 @@
+from collections import Counter
+from datetime import date
+from typing import List, NamedTuple, Optional, Tuple
+
+from api.models import Lesson, Schedule, day_key
+from config.settings import SCHEDULE_TIMES, WEEK_DAYS
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+# Поля занятия, изменения которых показываются подписчикам
+FIELDS = (
+    ("location", "место"),
+    ("teacher", "преподаватель"),
+    ("type", "тип"),
+    ("dts", "даты"),
+)
+
+
+class LessonChange(NamedTuple):
+    day: str
+    pair: str
+    kind: str
+    old: Optional[Lesson]
+    new: Optional[Lesson]
+
+
+def _identity(lesson: Lesson) -> Tuple[str, str, str, str, str]:
+    return lesson.subject, lesson.type, lesson.teacher, lesson.location, lesson.dts
+
+
+def _sort_key(value: str):
+    return (0, int(value)) if value.isdigit() else (1, value)
+
+
+def _take_match(candidates: List[Lesson], lesson: Lesson) -> Optional[Lesson]:
+    """
+    Находит в списке то же занятие в новой редакции: сначала по предмету и типу, потом по предмету.
+    """
+    for same in (
+        lambda other: other.subject == lesson.subject and other.type == lesson.type,
+        lambda other: other.subject == lesson.subject,
+    ):
+        for index, other in enumerate(candidates):
+            if same(other):
+                return candidates.pop(index)
+    return None
+
+
+def diff_pair(day: str, pair: str, old: Tuple[Lesson, ...], new: Tuple[Lesson, ...]) -> List[LessonChange]:
+    """
+    Сравнивает занятия одной пары: одинаковые пропускаются, остальные
+    сопоставляются по предмету и становятся изменёнными, добавленными или удалёнными.
+    """
+    common = Counter(map(_identity, old)) & Counter(map(_identity, new))
+
+    def rest(lessons: Tuple[Lesson, ...]) -> List[Lesson]:
+        left = common.copy()
+        result = []
+        for lesson in lessons:
+            identity = _identity(lesson)
+            if left[identity]:
+                left[identity] -= 1
+            else:
+                result.append(lesson)
+        return result
+
+    old_rest = rest(old)
+    new_rest = rest(new)
+    changes = []
+    for lesson in old_rest:
+        match = _take_match(new_rest, lesson)
+        if match is None:
+            changes.append(LessonChange(day, pair, REMOVED, lesson, None))
+        else:
+            changes.append(LessonChange(day, pair, CHANGED, lesson, match))
+    changes.extend(LessonChange(day, pair, ADDED, None, lesson) for lesson in new_rest)
+    return changes
+
+
+def diff_schedules(old: Schedule, new: Schedule, today: Optional[date] = None) -> List[LessonChange]:
+    """
+    Структурная разница двух версий расписания по дням, парам и занятиям.
+    Дни с одинаковым хэшем не разбираются; занятия, которые уже закончились, не учитываются.
+    """
+    if old.version == new.version:
+        return []
+    key = day_key(today or date.today())
+
+    def upcoming(lesson: Optional[Lesson]) -> bool:
+        return lesson is not None and lesson.is_upcoming(key)
+
+    changes = []
+    for day in sorted(set(old.days) | set(new.days), key=_sort_key):
+        old_hash = old.day_versions.get(day)
+        if old_hash is not None and old_hash == new.day_versions.get(day):
+            continue
+        old_pairs = dict(old.days.get(day, ()))
+        new_pairs = dict(new.days.get(day, ()))
+        for pair in sorted(set(old_pairs) | set(new_pairs), key=_sort_key):
+            for change in diff_pair(day, pair, old_pairs.get(pair, ()), new_pairs.get(pair, ())):
+                if upcoming(change.old) or upcoming(change.new):
+                    changes.append(change)
+    return changes
+
+
+def _describe(lesson: Lesson) -> str:
+    place = "🌐 Online" if lesson.online else f"📍 {lesson.location}"
+    return f"{lesson.subject} ({lesson.type}), {place}"
+
+
+def format_changes(group: str, changes: List[LessonChange]) -> str:
+    """
+    Короткое уведомление об изменениях: только затронутые пары, а не всё расписание.
+    """
+    lines = [f"🔔 Изменения в расписании группы {group}:"]
+    current_day = None
+    for change in changes:
+        if change.day != current_day:
+            current_day = change.day
+            lines.append(f"\n📅 {WEEK_DAYS.get(change.day, f'День {change.day}')}")
+        pair = f"{change.pair} пара ({SCHEDULE_TIMES.get(change.pair, 'N/A')})"
+        if change.kind == ADDED:
+            lines.append(f"➕ {pair}: {_describe(change.new)}, {change.new.dts}")
+        elif change.kind == REMOVED:
+            lines.append(f"➖ {pair}: {change.old.subject} ({change.old.type}) отменена")
+        else:
+            fields = [
+                f"{title}: {getattr(change.old, field)} → {getattr(change.new, field)}"
+                for field, title in FIELDS
+                if getattr(change.old, field) != getattr(change.new, field)
+            ]
+            lines.append(f"✏️ {pair}: {change.new.subject}, " + "; ".join(fields))
+    return "\n".join(lines)
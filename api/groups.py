@@ -0,0 +1,138 @@
+import bisect
+import difflib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable, List, Optional
+
+from config.settings import GROUP_CATALOG_PATH, NEGATIVE_CACHE_TTL, NEGATIVE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCatalog:
+    """
+    Каталог известных групп в отсортированном массиве.
+    Пополняется после каждого успешного запроса расписания и сохраняется
+    в JSON-снимок, чтобы автодополнение работало сразу после перезапуска.
+    """
+
+    def __init__(self, path: Optional[str] = GROUP_CATALOG_PATH):
+        self.path = path
+        self._groups: List[str] = []
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def __contains__(self, group: str) -> bool:
+        index = bisect.bisect_left(self._groups, group)
+        return index < len(self._groups) and self._groups[index] == group
+
+    def add(self, group: str) -> bool:
+        """
+        Добавляет группу в каталог. Возвращает True, если её там ещё не было.
+        """
+        index = bisect.bisect_left(self._groups, group)
+        if index < len(self._groups) and self._groups[index] == group:
+            return False
+        self._groups.insert(index, group)
+        self._dirty = True
+        return True
+
+    def update(self, groups: Iterable[str]):
+        self._groups = sorted(set(self._groups).union(groups))
+        self._dirty = True
+
+    def complete(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Группы, начинающиеся с prefix, в алфавитном порядке.
+        """
+        start = bisect.bisect_left(self._groups, prefix)
+        result = []
+        for group in self._groups[start:]:
+            if not group.startswith(prefix) or len(result) >= limit:
+                break
+            result.append(group)
+        return result
+
+    def suggest(self, group: str, limit: int = 3) -> List[str]:
+        """
+        Похожие группы для подсказки «возможно, ты имел в виду».
+        """
+        candidates = self.complete(group[:4], limit=500) or self._groups
+        return difflib.get_close_matches(group, candidates, n=limit, cutoff=0.6)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.update(json.load(f))
+            self._dirty = False
+            logger.info(f"Загружен каталог групп: {len(self._groups)} групп")
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось загрузить каталог групп {self.path}: {e}")
+
+    def save(self):
+        """
+        Сохраняет каталог, объединяя его с файлом: в нём могут быть группы из других процессов бота.
+        """
+        if not self.path or not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.load()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._groups, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+class GroupNotFoundError(LookupError):
+    """
+    API ответил, что такой группы нет.
+    """
+
+
+class NegativeCache:
+    """
+    Короткоживущий список ключей, для которых API ответил «не найдено»,
+    чтобы опечатки не отправлялись на rasp.dmami.ru снова и снова.
+    """
+
+    def __init__(self, ttl: float = NEGATIVE_CACHE_TTL, maxsize: int = NEGATIVE_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, float]" = OrderedDict()
+        # Сколько запросов к сайту удалось не делать; считают вызывающие, а не проверка «in»
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self._entries.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False
+        return True
+
+    def add(self, key: Hashable):
+        self._entries[key] = time.monotonic() + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable):
+        self._entries.pop(key, None)
+
+
+group_catalog = GroupCatalog()
+unknown_groups = NegativeCache()
@@ -0,0 +1,192 @@
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Counter:
+    """
+    Монотонно растущий счётчик, опционально с метками.
+    """
+    type = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {value}" for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """
+    Значение, которое может как расти, так и уменьшаться.
+    """
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        self._values[tuple(sorted(labels.items()))] = value
+
+
+class Histogram:
+    """
+    Гистограмма длительностей с фиксированными границами корзин.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self._counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{self.name}_sum {self.sum}")
+        lines.append(f"{self.name}_count {self.count}")
+        return lines
+
+
+class StatsCollector:
+    """
+    Превращает словарь статистики компонента (например, cache.stats())
+    в набор gauge-метрик с общим префиксом.
+    """
+    type = "gauge"
+
+    def __init__(self, prefix: str, help: str, func: Callable[[], Dict[str, float]]):
+        self.name = prefix
+        self.help = help
+        self.func = func
+
+    def render(self) -> List[str]:
+        try:
+            stats = self.func() or {}
+        except Exception as e:
+            logger.warning(f"Не удалось собрать статистику {self.name}: {e}")
+            return []
+        lines = []
+        for key, value in stats.items():
+            lines.append(f"# HELP {self.name}_{key} {self.help}")
+            lines.append(f"# TYPE {self.name}_{key} gauge")
+            lines.append(f"{self.name}_{key} {value}")
+        return lines
+
+
+class Registry:
+    """
+    Реестр метрик процесса с выводом в текстовом формате Prometheus.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.register(Counter(name, help))
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        return self.register(Gauge(name, help))
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, buckets))
+
+    def stats(self, prefix: str, help: str, func: Callable[[], Dict[str, float]]) -> StatsCollector:
+        return self.register(StatsCollector(prefix, help, func))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            if isinstance(metric, StatsCollector):
+                lines.extend(metric.render())
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+UPSTREAM_LATENCY = REGISTRY.histogram(
+    "schedule_upstream_fetch_seconds", "Время запроса расписания у rasp.dmami.ru")
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "schedule_upstream_errors_total", "Ошибки запросов к rasp.dmami.ru по видам")
+UPSTREAM_INFLIGHT = REGISTRY.gauge(
+    "schedule_upstream_inflight", "Запросы к rasp.dmami.ru, выполняющиеся прямо сейчас")
+FORMAT_LATENCY = REGISTRY.histogram(
+    "schedule_format_seconds", "Время форматирования расписания на день",
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+SEND_LATENCY = REGISTRY.histogram(
+    "telegram_send_seconds", "Время отправки сообщения в Telegram")
+UPSTREAM_RETRIES_TOTAL = REGISTRY.counter(
+    "schedule_upstream_retries_total", "Повторы и дублирующие запросы к rasp.dmami.ru по видам")
+CIRCUIT_STATE = REGISTRY.gauge(
+    "schedule_upstream_circuit_state", "Состояние предохранителя rasp.dmami.ru: 0 — замкнут, 1 — проба, 2 — разомкнут")
+CIRCUIT_TRANSITIONS = REGISTRY.counter(
+    "schedule_upstream_circuit_transitions_total", "Переключения предохранителя rasp.dmami.ru по новому состоянию")
+
+
+async def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY) -> web.AppRunner:
+    """
+    Запускает HTTP-эндпоинт /metrics для Prometheus.
+    """
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
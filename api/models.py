@@ -0,0 +1,206 @@
+import hashlib
+import json
+import re
+import sys
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Optional, Tuple
+
+# Словарь для преобразования русских названий месяцев
+MONTHS_RU = {
+    "янв": 1, "фев": 2, "мар": 3, "апр": 4, "май": 5, "июн": 6,
+    "июл": 7, "авг": 8, "сен": 9, "окт": 10, "ноя": 11, "дек": 12
+}
+
+DATE_RE = re.compile(r"(\d{1,2})\s+([а-яА-Я]+)", re.IGNORECASE)
+
+# Порядковый номер дня считается как month * 32 + day: он не зависит от года
+# и сохраняет порядок дат, поэтому проверка актуальности — два сравнения чисел.
+# Интервал с концом раньше начала переходит через Новый год (сен - янв).
+ALWAYS = (0, 13 * 32)
+# Таких номеров дней не бывает, поэтому занятие никогда не актуально
+NEVER = (-1, -1)
+# Даты в расписании без года, поэтому «ещё впереди» — это конец в ближайшие полгода
+# по кругу, а не «позже по календарю»: иначе в феврале осенние занятия казались бы будущими,
+# а в сентябре — весенние
+YEAR = 12 * 32
+UPCOMING_HORIZON = 6 * 32
+
+ONLINE_MARKERS = ("online", "онлайн", "webinar")
+
+
+def day_key(current_date: date) -> int:
+    """
+    Порядковый номер дня для сравнения с интервалами занятий.
+    """
+    return current_date.month * 32 + current_date.day
+
+
+def in_range(start: int, end: int, key: int) -> bool:
+    """
+    Попадает ли день в интервал дат, в том числе переходящий через Новый год.
+    """
+    if end < start:
+        return key >= start or key <= end
+    return start <= key <= end
+
+
+def parse_day(date_str: str) -> int:
+    """
+    Разбирает дату вида '01 сен' в порядковый номер дня.
+    """
+    match = DATE_RE.match(date_str)
+    if not match:
+        raise ValueError(f"Некорректный формат даты: {date_str}")
+
+    day, month_str = match.groups()
+    month_str = month_str.lower()[:3]
+    if month_str not in MONTHS_RU:
+        raise ValueError(f"Неизвестный месяц: {month_str}")
+
+    month = MONTHS_RU[month_str]
+    day = int(day)
+    # Проверяем, что такая дата существует (високосный год допускает 29 фев)
+    datetime(2000, month, day)
+    return month * 32 + day
+
+
+def parse_dts(dts: Optional[str]) -> Tuple[int, int]:
+    """
+    Разбирает поле dts в интервал порядковых номеров дней (начало, конец).
+    Для диапазона через Новый год конец меньше начала; NEVER означает,
+    что занятие никогда не считается актуальным.
+    """
+    if not dts or dts == "Не указано":
+        return ALWAYS
+
+    date_parts = [part.strip() for part in dts.split("-")]
+    try:
+        if len(date_parts) == 1:
+            single = parse_day(date_parts[0])
+            return single, single
+        if len(date_parts) == 2:
+            return parse_day(date_parts[0]), parse_day(date_parts[1])
+    except ValueError:
+        return NEVER
+    return NEVER
+
+
+def _text(value: Any, default: str) -> str:
+    # Одинаковые строки (преподаватели, аудитории, типы) повторяются
+    # в тысячах занятий, поэтому храним по одному экземпляру каждой.
+    # null в ответе API — то же, что отсутствующее поле.
+    return sys.intern(str(value)) if value is not None else default
+
+
+class Lesson:
+    """
+    Занятие в компактном виде с заранее разобранным интервалом дат.
+    """
+    __slots__ = ("subject", "type", "teacher", "location", "dts", "online", "start", "end")
+
+    def __init__(self, subject: str, type: str, teacher: str, location: str, dts: str):
+        self.subject = subject
+        self.type = type
+        self.teacher = teacher
+        self.location = location
+        self.dts = dts
+        loc_lower = location.lower()
+        self.online = any(marker in loc_lower for marker in ONLINE_MARKERS)
+        self.start, self.end = parse_dts(dts)
+
+    @classmethod
+    def from_api(cls, lesson: Dict[str, Any]) -> "Lesson":
+        return cls(
+            # Как и прежде, значение по умолчанию — только для отсутствующих полей:
+            # пустая строка выводится пустой, а пустой преподаватель — прочерком
+            subject=_text(lesson.get("sbj"), "Не указано"),
+            type=_text(lesson.get("type"), "Не указано"),
+            teacher=_text(lesson.get("teacher") or "-", "-"),
+            location=_text(lesson.get("location"), "Не указано"),
+            dts=_text(lesson.get("dts"), "Не указано"),
+        )
+
+    def is_actual(self, key: int) -> bool:
+        return in_range(self.start, self.end, key)
+
+    def is_upcoming(self, key: int) -> bool:
+        """
+        Занятие ещё не закончилось (идёт или будет в этом семестре).
+        """
+        if (self.start, self.end) == NEVER:
+            return False
+        return self.is_actual(key) or (self.end - key) % YEAR <= UPCOMING_HORIZON
+
+
+# День: кортеж пар (номер пары, кортеж занятий)
+Day = Tuple[Tuple[str, Tuple[Lesson, ...]], ...]
+
+
+class Schedule:
+    """
+    Нормализованное расписание группы: только нужные для вывода поля,
+    сгруппированные по дням и номерам пар.
+    """
+    __slots__ = ("ok", "days", "version", "day_versions", "fetched_at", "stale")
+
+    def __init__(
+        self,
+        ok: bool,
+        days: Dict[str, Day],
+        version: str = "",
+        day_versions: Optional[Dict[str, str]] = None,
+        fetched_at: float = 0.0,
+        stale: bool = False,
+    ):
+        self.ok = ok
+        self.days = days
+        # Хэш содержимого: меняется только при изменении расписания
+        self.version = version
+        # Хэши по дням: при сравнении версий неизменившиеся дни пропускаются
+        self.day_versions = day_versions or {}
+        # Когда расписание было получено с сайта (time.time())
+        self.fetched_at = fetched_at
+        # Сохранённая версия, показанная из-за недоступности сайта
+        self.stale = stale
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.ok or not self.days
+
+
+def normalize_schedule(data: Dict[str, Any]) -> Schedule:
+    """
+    Преобразует ответ API в компактную модель Schedule.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Данные должны быть словарем")
+
+    if data.get("status") != "ok":
+        return Schedule(ok=False, days={})
+
+    grid = data.get("grid") or {}
+    days = {}
+    day_versions = {}
+    for day, pairs in grid.items():
+        day_versions[str(day)] = content_hash(pairs)
+        if not pairs:
+            continue
+        day_pairs = tuple(
+            (str(pair_num), tuple(Lesson.from_api(lesson) for lesson in lessons))
+            for pair_num, lessons in pairs.items()
+            if lessons
+        )
+        if day_pairs:
+            days[str(day)] = day_pairs
+    # Версия всего расписания считается по хэшам дней, без повторной сериализации grid
+    version = content_hash(list(day_versions.items()))
+    return Schedule(ok=True, days=days, version=version, day_versions=day_versions, fetched_at=time.time())
+
+
+def content_hash(value: Any) -> str:
+    """
+    Короткий хэш содержимого (порядок ключей учитывается: от него зависит вывод).
+    """
+    raw = json.dumps(value, ensure_ascii=False).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
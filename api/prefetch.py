@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+
+from api.cache import ScheduleCache
+from api.groups import GroupNotFoundError, NegativeCache, unknown_groups
+from api.ratelimit import RateLimiter
+from config.settings import (
+    PREFETCH_INTERVAL, PREFETCH_AHEAD, PREFETCH_JITTER, PREFETCH_ACTIVE_WINDOW,
+    PREFETCH_CONCURRENCY, PREFETCH_RPS, PREFETCH_MAX_BACKOFF, SCHEDULE_CACHE_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+
+class PrefetchScheduler:
+    """
+    Фоновое обновление расписаний недавно запрошенных групп.
+    Перезапрашивает группу незадолго до истечения TTL в кэше, чтобы
+    пользователю почти никогда не приходилось ждать ответа rasp.dmami.ru.
+    Число одновременных запросов и их частота ограничены, а момент
+    обновления сдвигается на случайную задержку, чтобы не создавать всплесков.
+    Исчезнувшие группы перестают отслеживаться, а после ошибок следующая
+    попытка откладывается всё дальше (до max_backoff).
+    """
+
+    def __init__(
+        self,
+        cache: ScheduleCache,
+        loader: Callable[[str, str], Awaitable[Any]],
+        interval: float = PREFETCH_INTERVAL,
+        ahead: float = PREFETCH_AHEAD,
+        jitter: float = PREFETCH_JITTER,
+        active_window: float = PREFETCH_ACTIVE_WINDOW,
+        concurrency: int = PREFETCH_CONCURRENCY,
+        rps: float = PREFETCH_RPS,
+        max_tracked: int = SCHEDULE_CACHE_SIZE,
+        max_backoff: float = PREFETCH_MAX_BACKOFF,
+        unknown: NegativeCache = unknown_groups,
+    ):
+        self.cache = cache
+        self.loader = loader
+        self.interval = interval
+        self.ahead = ahead
+        self.jitter = jitter
+        self.active_window = active_window
+        self.max_tracked = max_tracked
+        self.max_backoff = max_backoff
+        self.unknown = unknown
+        self._concurrency = concurrency
+        self._limiter = RateLimiter(rps, 1)
+        self._last_seen: "OrderedDict[Key, float]" = OrderedDict()
+        self._scheduled: Set[Key] = set()
+        # Группы, которые обновляются всегда, даже если их давно не запрашивали (подписки)
+        self._pinned: Set[Key] = set()
+        # Группы с ошибками обновления: (ошибок подряд, когда пробовать снова)
+        self._failures: Dict[Key, Tuple[int, float]] = {}
+        self.stats = {"refreshes": 0, "errors": 0, "not_found": 0, "hits": 0, "misses": 0}
+
+    def record(self, key: Key, cached: bool):
+        """
+        Отмечает пользовательский запрос группы.
+        Для уже отслеживаемых групп считает попадания и промахи кэша.
+        """
+        if key in self._last_seen:
+            if cached:
+                self.stats["hits"] += 1
+            else:
+                self.stats["misses"] += 1
+        self._last_seen[key] = time.monotonic()
+        self._last_seen.move_to_end(key)
+        while len(self._last_seen) > self.max_tracked:
+            self._last_seen.popitem(last=False)
+
+    def pin(self, key: Key):
+        """
+        Оставляет группу в фоновом обновлении независимо от активности пользователей.
+        """
+        self._pinned.add(key)
+
+    def unpin(self, key: Key):
+        self._pinned.discard(key)
+
+    def _due(self) -> List[Key]:
+        """
+        Возвращает активные и закреплённые группы, запись которых скоро истечёт.
+        Группы, которые давно никто не запрашивал, перестают отслеживаться.
+        """
+        now = time.monotonic()
+        due = []
+        for key, last_seen in list(self._last_seen.items()):
+            if now - last_seen > self.active_window:
+                del self._last_seen[key]
+        for key in list(self._failures):
+            if key not in self._pinned and key not in self._last_seen:
+                del self._failures[key]
+        for key in self._pinned.union(self._last_seen):
+            if key in self._scheduled or key in self.unknown:
+                continue
+            if key in self._failures and self._failures[key][1] > now:
+                continue
+            if self.cache.expires_in(key) <= self.ahead:
+                due.append(key)
+        return due
+
+    async def _refresh(self, key: Key, semaphore: asyncio.Semaphore):
+        group, session = key
+        try:
+            await asyncio.sleep(random.uniform(0, self.jitter))
+            async with semaphore:
+                await self._limiter.acquire()
+                await self.cache.refresh(key, lambda: self.loader(group, session))
+            self.stats["refreshes"] += 1
+            self._failures.pop(key, None)
+            logger.debug("Расписание группы %s обновлено в фоне", group)
+        except asyncio.CancelledError:
+            raise
+        except GroupNotFoundError:
+            # Группа исчезла с сайта: больше не обновляем её, пока снова не спросят.
+            # Закреплённые (подписки) вернутся в обновление, когда истечёт запись в unknown
+            self.stats["not_found"] += 1
+            self._last_seen.pop(key, None)
+            self._failures.pop(key, None)
+            self.unknown.add(key)
+            logger.info(f"Группа {group} больше не найдена, фоновое обновление остановлено")
+        except Exception as e:
+            self.stats["errors"] += 1
+            failures = self._failures.get(key, (0, 0.0))[0] + 1
+            delay = min(self.max_backoff, self.interval * 2 ** failures)
+            self._failures[key] = (failures, time.monotonic() + delay)
+            logger.warning(f"Не удалось обновить расписание группы {group} в фоне: {e}, "
+                           f"следующая попытка через {delay:.0f} с")
+        finally:
+            self._scheduled.discard(key)
+
+    async def run(self):
+        """
+        Основной цикл фонового обновления. Работает до отмены задачи.
+        """
+        logger.info("Запущено фоновое обновление расписаний")
+        semaphore = asyncio.Semaphore(self._concurrency)
+        tasks: Set[asyncio.Task] = set()
+        try:
+            while True:
+                for key in self._due():
+                    self._scheduled.add(key)
+                    task = asyncio.create_task(self._refresh(key, semaphore))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                await asyncio.sleep(self.interval * random.uniform(0.8, 1.2))
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._scheduled.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "tracked": len(self._last_seen),
+            "pinned": len(self._pinned),
+            "backing_off": len(self._failures),
+            "scheduled": len(self._scheduled),
+        }
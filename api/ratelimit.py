@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+
+class RateLimiter:
+    """
+    Асинхронный token bucket: не больше rate операций в секунду
+    с допустимым всплеском до burst операций подряд.
+    Если rate <= 0, ограничение отключено.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """
+        Резервирует токен и возвращает, сколько секунд нужно подождать до его появления.
+        Токены могут уходить в минус: так ожидающие обслуживаются по очереди.
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def try_reserve(self) -> bool:
+        """
+        Берёт токен, только если он есть прямо сейчас: без ожидания и без ухода в минус.
+        """
+        if self.rate <= 0:
+            return True
+        self._refill(time.monotonic())
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def delay(self) -> float:
+        """
+        Сколько секунд осталось до появления свободного токена (без резервирования).
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    async def acquire(self):
+        """
+        Ждёт, пока не освободится токен.
+        """
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def try_acquire(self) -> bool:
+        """
+        Как try_reserve: для необязательных запросов, которые не стоят ожидания.
+        """
+        return self.try_reserve()
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from api.metrics import CIRCUIT_STATE, CIRCUIT_TRANSITIONS, UPSTREAM_RETRIES_TOTAL
+from config.settings import (
+    HTTP_TIMEOUT, UPSTREAM_MIN_TIMEOUT, UPSTREAM_TIMEOUT_FACTOR,
+    UPSTREAM_BACKOFF_BASE, UPSTREAM_BACKOFF_CAP, BREAKER_FAILURES, BREAKER_RECOVERY,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(ConnectionError):
+    """
+    Предохранитель разомкнут: сайт недавно не отвечал, запрос не отправлялся.
+    """
+
+
+class LatencyTracker:
+    """
+    Скользящее окно задержек удачных запросов.
+    По нему считаются таймаут (p99 с запасом) и порог для дублирующего запроса (p95).
+    """
+
+    def __init__(
+        self,
+        window: int = 200,
+        min_samples: int = 20,
+        min_timeout: float = UPSTREAM_MIN_TIMEOUT,
+        max_timeout: float = HTTP_TIMEOUT,
+        factor: float = UPSTREAM_TIMEOUT_FACTOR,
+    ):
+        self.min_samples = min_samples
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.factor = factor
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def timeout(self) -> float:
+        """
+        Таймаут запроса: p99 * factor в пределах [min_timeout, max_timeout].
+        Пока замеров мало, используется max_timeout.
+        """
+        p99 = self.percentile(0.99)
+        if p99 is None:
+            return self.max_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.factor))
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Через сколько отправлять дублирующий запрос (p95), или None, если замеров мало.
+        """
+        return self.percentile(0.95)
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failure_threshold ошибок подряд размыкается
+    и recovery_time секунд сразу отказывает, не нагружая сайт.
+    Затем пропускает один пробный запрос: удача замыкает цепь, ошибка — снова размыкает.
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURES, recovery_time: float = BREAKER_RECOVERY):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_inflight = False
+        CIRCUIT_STATE.set(STATE_VALUES[CLOSED])
+
+    def _switch(self, state: str):
+        if state == self.state:
+            return
+        logger.warning(f"Предохранитель rasp.dmami.ru: {self.state} -> {state}")
+        self.state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state])
+        CIRCUIT_TRANSITIONS.inc(to=state)
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self.recovery_time - time.monotonic())
+
+    def before_request(self):
+        """
+        Разрешает запрос или бросает CircuitOpenError.
+        """
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                raise CircuitOpenError(f"Сайт недоступен, повтор через {self.retry_after():.0f} с")
+            self._switch(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probe_inflight:
+                raise CircuitOpenError("Сайт недоступен, идёт пробный запрос")
+            self._probe_inflight = True
+
+    def record_success(self):
+        self._probe_inflight = False
+        self.failures = 0
+        self._switch(CLOSED)
+
+    def record_failure(self):
+        self._probe_inflight = False
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._switch(OPEN)
+
+    def release(self):
+        """
+        Запрос завершился без вывода о здоровье сайта (например, отменён).
+        """
+        self._probe_inflight = False
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "state": STATE_VALUES[self.state],
+            "failures": self.failures,
+            "retry_after": round(self.retry_after(), 1) if self.state == OPEN else 0,
+        }
+
+
+def backoff(attempt: int, base: float = UPSTREAM_BACKOFF_BASE, cap: float = UPSTREAM_BACKOFF_CAP) -> float:
+    """
+    Пауза перед повтором с полным джиттером: случайно от 0 до base * 2^attempt (не больше cap).
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+async def hedged(
+    make: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    allow: Optional[Callable[[], Awaitable[bool]]] = None,
+) -> T:
+    """
+    Выполняет запрос; если за delay секунд ответа нет, отправляет второй такой же
+    и возвращает первый удачный результат. Оставшийся запрос отменяется.
+    allow решает, можно ли отправить второй запрос прямо сейчас (например, есть ли
+    свободный токен в лимите): если нет, просто ждём первый.
+    """
+    first = asyncio.ensure_future(make())
+    if delay is None:
+        return await first
+
+    pending = {first}
+    try:
+        done, _ = await asyncio.wait(pending, timeout=delay)
+        if not done and (allow is None or await allow()):
+            UPSTREAM_RETRIES_TOTAL.inc(kind="hedge")
+            logger.debug("Запрос дольше %.2f с, отправляем дублирующий", delay)
+            pending.add(asyncio.ensure_future(make()))
+
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,23 +1,30 @@
+import asyncio
 import requests
 import json
 import logging
-from typing import Dict, Any
-from datetime import datetime, timedelta
-import re
-from config.settings import BASE_URL, API_URL, HEADERS, SCHEDULE_TIMES, WEEK_DAYS
+from typing import Dict, Any, Optional, Union
+from datetime import datetime
+from config.settings import (
+    BASE_URL, API_URL, HEADERS, SCHEDULE_TIMES, WEEK_DAYS, LOG_LEVEL, SNAPSHOT_ENABLED, STALE_TIMEOUT,
+)
+from api.client import get_client
+from api.cache import schedule_cache
+from api.prefetch import PrefetchScheduler
+from api.metrics import REGISTRY
+from api.search import schedule_index
+from api.groups import GroupNotFoundError, group_catalog, unknown_groups
+from api.snapshots import snapshot_store
+from api.shared import shared_schedules
+from api.models import Schedule, in_range, normalize_schedule, parse_dts, day_key
 
 # Настройка логирования
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
-# Словарь для преобразования русских названий месяцев
-MONTHS_RU = {
-    "янв": 1, "фев": 2, "мар": 3, "апр": 4, "май": 5, "июн": 6,
-    "июл": 7, "авг": 8, "сен": 9, "окт": 10, "ноя": 11, "дек": 12
-}
+EMPTY_SCHEDULE = "📭 Расписание пустое."
 
 
 def fetch_schedule(group: str, session: str = "0") -> Dict[str, Any]:
@@ -28,16 +35,16 @@ def fetch_schedule(group: str, session: str = "0") -> Dict[str, Any]:
     session = requests.Session()
 
     try:
-        logger.info("Получаем куки с главной страницы...")
+        logger.debug("Получаем куки с главной страницы...")
         response = session.get(BASE_URL, headers=HEADERS, timeout=10)
         response.raise_for_status()
 
-        logger.info(f"Запрашиваем расписание для группы {group}...")
+        logger.debug("Запрашиваем расписание для группы %s...", group)
         response = session.get(API_URL, params=params, headers=HEADERS, timeout=10)
         response.raise_for_status()
 
         content_type = response.headers.get("Content-Type", "")
-        logger.info(f"Content-Type ответа: {content_type}")
+        logger.debug("Content-Type ответа: %s", content_type)
 
         if "application/json" not in content_type.lower():
             logger.error("Сервер вернул не JSON:")
@@ -45,13 +52,13 @@ def fetch_schedule(group: str, session: str = "0") -> Dict[str, Any]:
             raise ValueError("Ожидался JSON, но получен другой формат")
 
         data = response.json()
-        logger.debug(f"Полученные данные: {data}")
 
         if isinstance(data, str):
             logger.warning("Данные получены как строка, пробуем распарсить ещё раз...")
             data = json.loads(data)
 
-        logger.info(f"Полные данные API: {json.dumps(data, ensure_ascii=False, indent=2)}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Полные данные API: %s", json.dumps(data, ensure_ascii=False, indent=2))
         return data
 
     except requests.HTTPError as e:
@@ -70,82 +77,190 @@ def fetch_schedule(group: str, session: str = "0") -> Dict[str, Any]:
         raise
 
 
-def is_date_range_valid(dts: str, current_date: datetime) -> bool:
+async def fetch_schedule_async(group: str, session: str = "0", sent: Optional[asyncio.Event] = None) -> Dict[str, Any]:
     """
-    Проверяет, является ли диапазон дат в поле dts актуальным для текущей даты.
+    Асинхронная версия fetch_schedule через общий пул соединений.
+    Используется в обработчиках бота, чтобы не блокировать цикл событий.
+    """
+    return await get_client().fetch_schedule(group, session, sent)
+
+
+# Общий ответ для несуществующих групп
+NOT_FOUND = Schedule(ok=False, days={})
+
+
+async def load_schedule(group: str, session: str = "0", sent: Optional[asyncio.Event] = None) -> Schedule:
+    """
+    Запрашивает расписание у API и сразу переводит его в компактную модель.
+    Для несуществующей группы бросает GroupNotFoundError, чтобы ответ не попал в кэш.
+    """
+    schedule = normalize_schedule(await fetch_schedule_async(group, session, sent))
+    if not schedule.ok:
+        raise GroupNotFoundError(group)
+    return schedule
+
+
+def _revalidated(key, task: asyncio.Task):
+    """
+    Запрос, который не дождались и показали снимок, всё же завершился: кладём свежую версию в кэш.
     """
-    logger.info(f"Проверка диапазона дат: '{dts}'")
-    if not dts or dts == "Не указано":
-        logger.info("Даты не указаны, занятие считается актуальным")
-        return True
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is None:
+        schedule_cache.set(key, task.result())
+        logger.info(f"Расписание группы {key[0]} обновлено после показа снимка")
+    else:
+        logger.warning(f"Фоновая перепроверка расписания группы {key[0]} не удалась: {error}")
 
+
+async def load_or_restore(group: str, session: str = "0") -> Schedule:
+    """
+    Загрузка при промахе кэша с оглядкой на снимок на диске.
+    Снимок не старше TTL кэша отдаётся сразу (тёплый старт после перезапуска).
+    Если снимок старше, идём на сайт, но ждём не дольше STALE_TIMEOUT: при ошибке
+    или медленном ответе показываем снимок с пометкой stale, а запрос к сайту
+    продолжается в фоне и по завершении обновляет кэш. STALE_TIMEOUT отсчитывается
+    с отправки запроса: очередь в собственном лимите запросов — не недоступность сайта.
+    """
+    key = (group, session)
+    if shared_schedules is not None:
+        # Группу мог только что загрузить другой процесс бота
+        shared = await shared_schedules.get(key)
+        if shared is not None and shared.age < schedule_cache.ttl:
+            return shared.schedule
+
+    snapshot = await snapshot_store.get(key) if SNAPSHOT_ENABLED else None
+    if snapshot is None:
+        return await load_schedule(group, session)
+    if snapshot.age < schedule_cache.ttl:
+        snapshot_store.stats["restored"] += 1
+        logger.debug("Расписание группы %s взято из снимка", group)
+        return snapshot.schedule
+
+    sent = asyncio.Event()
+    load = asyncio.ensure_future(load_schedule(group, session, sent))
+    queued = asyncio.ensure_future(sent.wait())
+    try:
+        await asyncio.wait((load, queued), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        queued.cancel()
     try:
-        date_parts = [part.strip() for part in dts.split("-")]
-        current_year = current_date.year
-
-        def parse_date(date_str: str) -> datetime:
-            match = re.match(r"(\d{1,2})\s+([а-яА-Я]+)", date_str, re.IGNORECASE)
-            if not match:
-                raise ValueError(f"Некорректный формат даты: {date_str}")
-
-            day, month_str = match.groups()
-            month_str = month_str.lower()[:3]
-            if month_str not in MONTHS_RU:
-                raise ValueError(f"Неизвестный месяц: {month_str}")
-
-            month = MONTHS_RU[month_str]
-            day = int(day)
-            return datetime(current_year, month, day)
-
-        if len(date_parts) == 1:
-            single_date = parse_date(date_parts[0])
-            is_valid = single_date.date() == current_date.date()
-            logger.info(
-                f"Одиночная дата: {single_date.date()}, текущая дата: {current_date.date()}, актуально: {is_valid}")
-            return is_valid
-        elif len(date_parts) == 2:
-            start_str, end_str = date_parts
-            start_date = parse_date(start_str)
-            end_date = parse_date(end_str)
-
-            if end_date < start_date:
-                end_date = end_date.replace(year=current_year + 1)
-
-            is_valid = start_date.date() <= current_date.date() <= end_date.date()
-            logger.info(
-                f"Диапазон: {start_date.date()} - {end_date.date()}, текущая дата: {current_date.date()}, актуально: {is_valid}")
-            return is_valid
+        return await asyncio.wait_for(asyncio.shield(load), STALE_TIMEOUT)
+    except GroupNotFoundError:
+        raise
+    except Exception as e:
+        if load.done():
+            logger.warning(f"Сайт расписания недоступен для группы {group}: {e}")
         else:
-            logger.warning(f"Некорректный формат диапазона дат: '{dts}'")
-            return False
+            logger.warning(f"Сайт расписания не ответил за {STALE_TIMEOUT:.0f} с для группы {group}")
+            load.add_done_callback(lambda task: _revalidated(key, task))
+        snapshot_store.stats["stale_served"] += 1
+        snapshot.schedule.stale = True
+        return snapshot.schedule
 
-    except Exception as e:
-        logger.error(f"Ошибка парсинга диапазона дат '{dts}': {e}")
-        return False
 
+async def refresh_schedule(group: str, session: str = "0") -> Schedule:
+    """
+    Загрузчик для фонового обновления. При нескольких процессах сначала проверяет,
+    не обновил ли группу другой процесс, чтобы не запрашивать сайт повторно.
+    """
+    if shared_schedules is not None:
+        shared = await shared_schedules.get((group, session))
+        if shared is not None and shared.age < schedule_cache.ttl - prefetcher.ahead:
+            return shared.schedule
+    return await load_schedule(group, session)
+
+
+async def get_schedule(group: str, session: str = "0") -> Schedule:
+    """
+    Возвращает расписание группы из общего кэша, при промахе запрашивает API.
+    Одновременные запросы одной и той же группы объединяются в один.
+    Недавно не найденные группы не запрашиваются повторно, пока не истечёт NEGATIVE_CACHE_TTL.
+    """
+    key = (group, session)
+    if key in unknown_groups:
+        unknown_groups.hits += 1
+        return NOT_FOUND
+
+    cached = schedule_cache.get(key) is not None
+    try:
+        schedule = await schedule_cache.get_or_load(
+            key,
+            lambda: load_or_restore(group, session),
+        )
+    except GroupNotFoundError:
+        logger.info(f"Группа {group} не найдена, запоминаем на {unknown_groups.ttl:.0f} с")
+        unknown_groups.add(key)
+        return NOT_FOUND
+
+    # В фоне обновляем только существующие группы
+    prefetcher.record(key, cached=cached)
+    return schedule
+
+
+# Фоновое обновление кэша для групп, которые недавно запрашивали
+prefetcher = PrefetchScheduler(schedule_cache, refresh_schedule)
+REGISTRY.stats("schedule_prefetch", "Статистика фонового обновления расписаний", prefetcher.get_stats)
+
+# Каждая свежая версия расписания сохраняется на диск
+if SNAPSHOT_ENABLED:
+    schedule_cache.add_listener(snapshot_store.on_schedule)
+    REGISTRY.stats("schedule_snapshots", "Статистика снимков расписаний на диске", snapshot_store.get_stats)
+
+# При нескольких процессах свежие версии публикуются в общий кэш
+if shared_schedules is not None:
+    schedule_cache.add_listener(shared_schedules.on_schedule)
+    REGISTRY.stats("schedule_shared_cache", "Статистика общего кэша расписаний", lambda: shared_schedules.stats)
+
+# Индекс преподавателей и аудиторий обновляется при каждой загрузке расписания группы
+# и забывает группу, когда её расписание уходит из кэша
+schedule_cache.add_listener(schedule_index.update)
+schedule_cache.add_evict_listener(schedule_index.remove)
+REGISTRY.stats("schedule_index", "Размер индекса поиска", lambda: {
+    "teachers": len(schedule_index.teachers),
+    "locations": len(schedule_index.locations),
+})
+
+# Каталог групп пополняется каждой успешно загруженной группой
+schedule_cache.add_listener(lambda key, schedule: group_catalog.add(key[0]))
+REGISTRY.stats("schedule_groups", "Каталог групп и кэш несуществующих групп", lambda: {
+    "known": len(group_catalog),
+    "unknown": len(unknown_groups),
+    "unknown_hits": unknown_groups.hits,
+})
 
-def format_schedule(data: Dict[str, Any], selected_day: str = None, group: str = "") -> str:
+
+def is_date_range_valid(dts: str, current_date: datetime) -> bool:
+    """
+    Проверяет, является ли диапазон дат в поле dts актуальным для текущей даты.
+    """
+    return in_range(*parse_dts(dts), day_key(current_date))
+
+
+def format_schedule(data: Union[Schedule, Dict[str, Any]], selected_day: str = None, group: str = "") -> str:
     """
     Форматирует данные расписания с улучшенным дизайном и иконками.
     """
-    if not isinstance(data, dict):
+    if isinstance(data, dict):
+        data = normalize_schedule(data)
+    elif not isinstance(data, Schedule):
         logger.error(f"Ожидался словарь, но получен: {type(data)}")
         raise ValueError("Данные должны быть словарем")
 
-    if data.get("status") != "ok":
+    if not data.ok:
         return "❌ Ошибка: расписание не найдено."
 
-    grid = data.get("grid", {})
-    if not grid:
-        return "📭 Расписание пустое."
+    if not data.days:
+        return EMPTY_SCHEDULE
 
     formatted = []
-    current_date = datetime.now()
-    days_to_process = [selected_day] if selected_day else grid.keys()
+    today = day_key(datetime.now())
+    days_to_process = [selected_day] if selected_day else data.days.keys()
 
     for day in days_to_process:
-        pairs = grid.get(day, {})
-        if not pairs or not any(pairs.values()):
+        pairs = data.days.get(day)
+        if not pairs:
             continue
 
         day_name = WEEK_DAYS.get(day, f"День {day}")
@@ -161,17 +276,8 @@ def format_schedule(data: Dict[str, Any], selected_day: str = None, group: str =
         header += " ───"
         formatted.append(header)
 
-        for pair_num, lessons in pairs.items():
-            if not lessons:
-                continue
-
-            valid_lessons = []
-            for lesson in lessons:
-                dts = lesson.get("dts", "Не указано")
-                if not is_date_range_valid(dts, current_date):
-                    continue
-                valid_lessons.append(lesson)
-
+        for pair_num, lessons in pairs:
+            valid_lessons = [lesson for lesson in lessons if lesson.is_actual(today)]
             if not valid_lessons:
                 continue
 
@@ -179,22 +285,15 @@ def format_schedule(data: Dict[str, Any], selected_day: str = None, group: str =
             formatted.append(f"\n🕒 Пара {pair_num} ({time})")
 
             for lesson in valid_lessons:
-                subject = lesson.get("sbj", "Не указано")
-                lesson_type = lesson.get("type", "Не указано")
-                teacher = lesson.get("teacher", "-")
-                location = lesson.get("location", "Не указано")
-                dts = lesson.get("dts", "Не указано")
-
-                formatted.append(f"📖 {subject} ({lesson_type})")
-                formatted.append(f"👨‍🏫 {teacher if teacher else '-'}")
+                formatted.append(f"📖 {lesson.subject} ({lesson.type})")
+                formatted.append(f"👨‍🏫 {lesson.teacher}")
 
-                loc_lower = location.lower()
-                if "online" in loc_lower or "онлайн" in loc_lower or "webinar" in loc_lower:
+                if lesson.online:
                     formatted.append(f"🌐 Online курс")
                 else:
-                    formatted.append(f"📍 {location}")
+                    formatted.append(f"📍 {lesson.location}")
 
-                formatted.append(f"🗓️ {dts}")
+                formatted.append(f"🗓️ {lesson.dts}")
                 formatted.append("─────────────────────")  # Разделитель между парами
 
-    return "\n".join(formatted).strip() if formatted else "📭 Расписание пустое."
+    return "\n".join(formatted).strip() if formatted else EMPTY_SCHEDULE
@@ -0,0 +1,214 @@
+import bisect
+import re
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from api.models import Lesson, Schedule, day_key
+from config.settings import SCHEDULE_TIMES, WEEK_DAYS
+
+GroupKey = Tuple[str, str]
+
+SEPARATORS_RE = re.compile(r"[,;/]")
+NON_WORD_RE = re.compile(r"[^\w\s-]+")
+SPACES_RE = re.compile(r"\s+")
+
+
+def normalize_name(value: str) -> str:
+    """
+    Приводит имя преподавателя или аудитории к виду для поиска:
+    нижний регистр, ё -> е, без точек и лишних пробелов.
+    """
+    value = value.lower().replace("ё", "е")
+    value = NON_WORD_RE.sub(" ", value)
+    return SPACES_RE.sub(" ", value).strip()
+
+
+class IndexEntry(NamedTuple):
+    group: str
+    day: str
+    pair: str
+    lesson: Lesson
+
+
+class InvertedIndex:
+    """
+    Инвертированный индекс: нормализованное имя -> занятия по группам.
+    Поиск по префиксу любого слова имени идёт бинарным поиском
+    по отсортированному списку ключей.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[GroupKey, List[IndexEntry]]] = {}
+        self._group_terms: Dict[GroupKey, Set[str]] = {}
+        # Имя в исходном написании для вывода
+        self._display: Dict[str, str] = {}
+        # Пары (хвост имени, начиная с каждого слова; имя) для префиксного поиска
+        self._keys: List[Tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._postings)
+
+    def _add_term(self, term: str):
+        words = term.split(" ")
+        for i in range(len(words)):
+            bisect.insort(self._keys, (" ".join(words[i:]), term))
+
+    def _remove_term(self, term: str):
+        words = term.split(" ")
+        for i in range(len(words)):
+            key = (" ".join(words[i:]), term)
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def remove_group(self, group_key: GroupKey):
+        for term in self._group_terms.pop(group_key, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(group_key, None)
+            if not postings:
+                del self._postings[term]
+                self._display.pop(term, None)
+                self._remove_term(term)
+
+    def update_group(self, group_key: GroupKey, entries: Iterable[Tuple[str, IndexEntry]]):
+        """
+        Заменяет все записи группы новыми парами (имя, занятие).
+        """
+        self.remove_group(group_key)
+        grouped: Dict[str, List[IndexEntry]] = {}
+        for name, entry in entries:
+            term = normalize_name(name)
+            if term:
+                grouped.setdefault(term, []).append(entry)
+                self._display.setdefault(term, name.strip())
+
+        for term, term_entries in grouped.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                self._add_term(term)
+            self._postings[term][group_key] = term_entries
+        self._group_terms[group_key] = set(grouped)
+
+    def find_terms(self, query: str, limit: int = 20) -> List[str]:
+        """
+        Находит имена, у которых какое-либо слово начинается с запроса.
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+        terms: List[str] = []
+        index = bisect.bisect_left(self._keys, (query, ""))
+        while index < len(self._keys) and self._keys[index][0].startswith(query):
+            term = self._keys[index][1]
+            if term not in terms:
+                terms.append(term)
+                if len(terms) >= limit:
+                    break
+            index += 1
+        return terms
+
+    def display_name(self, term: str) -> str:
+        return self._display.get(term, term)
+
+    def entries(self, term: str) -> List[IndexEntry]:
+        result = []
+        for group_entries in self._postings.get(term, {}).values():
+            result.extend(group_entries)
+        return result
+
+
+class ScheduleIndex:
+    """
+    Индексы по преподавателям и аудиториям поверх расписаний из кэша.
+    Обновляется по одной группе, когда её расписание загружено или обновлено,
+    и не хранит группы, которых уже нет в кэше.
+    """
+
+    def __init__(self):
+        self.teachers = InvertedIndex()
+        self.locations = InvertedIndex()
+        self._versions: Dict[GroupKey, str] = {}
+
+    def update(self, group_key: GroupKey, schedule: Schedule):
+        if self._versions.get(group_key) == schedule.version:
+            return
+        group = group_key[0]
+        teachers = []
+        locations = []
+        for day, pairs in schedule.days.items():
+            for pair_num, lessons in pairs:
+                for lesson in lessons:
+                    entry = IndexEntry(group, day, pair_num, lesson)
+                    for teacher in SEPARATORS_RE.split(lesson.teacher):
+                        if teacher.strip() and teacher.strip() != "-":
+                            teachers.append((teacher, entry))
+                    if not lesson.online and lesson.location != "Не указано":
+                        locations.append((lesson.location, entry))
+        self.teachers.update_group(group_key, teachers)
+        self.locations.update_group(group_key, locations)
+        self._versions[group_key] = schedule.version
+
+    def remove(self, group_key: GroupKey):
+        self.teachers.remove_group(group_key)
+        self.locations.remove_group(group_key)
+        self._versions.pop(group_key, None)
+
+
+def current_pair(now: datetime) -> Optional[str]:
+    """
+    Номер пары, которая идёт в момент now, или None.
+    """
+    minutes = now.hour * 60 + now.minute
+    for pair_num, interval in SCHEDULE_TIMES.items():
+        start, end = interval.split("–")
+        start_h, start_m = map(int, start.split(":"))
+        end_h, end_m = map(int, end.split(":"))
+        if start_h * 60 + start_m <= minutes <= end_h * 60 + end_m:
+            return pair_num
+    return None
+
+
+def _sort_key(entry: IndexEntry):
+    return int(entry.day) if entry.day.isdigit() else 99, int(entry.pair) if entry.pair.isdigit() else 99, entry.group
+
+
+def format_matches(index: InvertedIndex, query: str, title: str, now: Optional[datetime] = None) -> str:
+    """
+    Форматирует найденные по запросу занятия на эту неделю: сначала то, что идёт сейчас.
+    """
+    now = now or datetime.now()
+    terms = index.find_terms(query)
+    if not terms:
+        return f"🔍 Ничего не найдено по запросу «{query}»."
+
+    today = day_key(now)
+    weekday = str(now.isoweekday())
+    pair_now = current_pair(now)
+    lines = []
+    for term in terms[:5]:
+        entries = sorted((e for e in index.entries(term) if e.lesson.is_actual(today)), key=_sort_key)
+        if not entries:
+            continue
+        lines.append(f"{title} {index.display_name(term)}")
+        for entry in entries:
+            if entry.day == weekday and entry.pair == pair_now:
+                lines.append(f"⏰ Сейчас: {entry.lesson.subject}, группа {entry.group}, {entry.lesson.location}")
+        current_day = None
+        for entry in entries:
+            if entry.day != current_day:
+                current_day = entry.day
+                lines.append(f"\n📅 {WEEK_DAYS.get(entry.day, f'День {entry.day}')}")
+            time = SCHEDULE_TIMES.get(entry.pair, "N/A")
+            lesson = entry.lesson
+            place = "🌐 Online" if lesson.online else f"📍 {lesson.location}"
+            lines.append(f"🕒 {entry.pair} ({time}) {lesson.subject} ({lesson.type}), {entry.group}, {place}")
+        lines.append("─────────────────────")
+
+    if not lines:
+        return f"🔍 По запросу «{query}» на этой неделе занятий нет."
+    return "\n".join(lines)
+
+
+schedule_index = ScheduleIndex()
@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+from api.models import Schedule
+from api.ratelimit import RateLimiter
+from api.snapshots import Snapshot, decode_schedule, encode_schedule
+from config.settings import SHARED_BACKEND, SHARED_REDIS_URL, SCHEDULE_CACHE_TTL, WORKERS
+from utils.tasks import BackgroundTasks
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+
+class LocalBackend:
+    """
+    Общее хранилище в памяти процесса: для запуска в одном процессе.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, bytes]] = {}
+        self._buckets: Dict[str, RateLimiter] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            self._values.pop(key, None)
+            return None
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        self._values[key] = (time.monotonic() + ttl, value)
+
+    async def reserve(self, key: str, rate: float, burst: int, wait: bool = True) -> Optional[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None or (bucket.rate, bucket.burst) != (rate, max(1, burst)):
+            bucket = self._buckets[key] = RateLimiter(rate, burst)
+        if wait:
+            return bucket.reserve()
+        return 0.0 if bucket.try_reserve() else None
+
+    async def close(self):
+        self._values.clear()
+        self._buckets.clear()
+
+
+# Тот же token bucket, что и RateLimiter.reserve (или try_reserve при ARGV[3] = 0), но атомарно в Redis.
+# Время берётся у самого Redis, чтобы расхождение часов машин не влияло на лимит.
+RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local wait = ARGV[3] == '1'
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate) - 1
+if tokens < 0 and not wait then
+    return false
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class RedisBackend:
+    """
+    Общее хранилище в Redis для нескольких процессов и машин.
+    Принимает клиент redis.asyncio или fakeredis.aioredis.
+    """
+
+    def __init__(self, client, prefix: str = "schedule-bot:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def reserve(self, key: str, rate: float, burst: int, wait: bool = True) -> Optional[float]:
+        delay = await self.client.eval(RESERVE_SCRIPT, 1, self.prefix + key, rate, max(1, burst), int(wait))
+        return float(delay) if delay is not None else None
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_backend(name: str = SHARED_BACKEND):
+    """
+    Создаёт общее хранилище по имени: local, redis или fakeredis.
+    """
+    if name == "local":
+        return LocalBackend()
+    if name == "redis":
+        # Для этого варианта нужен пакет redis (pip install redis)
+        from redis.asyncio import Redis
+        logger.info("Кэш расписаний и лимит запросов общие через Redis")
+        return RedisBackend(Redis.from_url(SHARED_REDIS_URL))
+    if name == "fakeredis":
+        # Redis в памяти процесса (pip install "fakeredis[lua]": без lupa не работает EVAL).
+        # У каждого процесса свой экземпляр, поэтому между процессами ничего не делится
+        from fakeredis.aioredis import FakeRedis
+        return RedisBackend(FakeRedis())
+    raise ValueError(f"Неизвестное общее хранилище: {name}")
+
+
+class SharedScheduleCache:
+    """
+    Второй уровень кэша расписаний, общий для всех процессов бота.
+    Хранит то же сжатое представление, что и снимки на диске.
+    """
+
+    def __init__(self, backend, ttl: float = SCHEDULE_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        # Время получения версий, которые этот процесс уже записал или прочитал
+        self._known: Dict[Key, float] = {}
+        self._writes = BackgroundTasks()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "errors": 0}
+
+    @staticmethod
+    def _name(key: Key) -> str:
+        return f"schedule:{key[0]}:{key[1]}"
+
+    async def get(self, key: Key) -> Optional[Snapshot]:
+        try:
+            blob = await self.backend.get(self._name(key))
+            if blob is None:
+                self.stats["misses"] += 1
+                return None
+            schedule = decode_schedule(blob)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Не удалось прочитать расписание {key} из общего кэша: {e}")
+            return None
+        self.stats["hits"] += 1
+        self._known[key] = schedule.fetched_at
+        return Snapshot(schedule)
+
+    async def put(self, key: Key, schedule: Schedule):
+        if self._known.get(key, 0) >= schedule.fetched_at:
+            return
+        try:
+            await self.backend.set(self._name(key), encode_schedule(schedule), self.ttl)
+            self._known[key] = schedule.fetched_at
+            self.stats["writes"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"Не удалось записать расписание {key} в общий кэш: {e}")
+
+    def on_schedule(self, key: Key, schedule: Schedule):
+        """
+        Обработчик обновления локального кэша: публикует свежую версию для других процессов.
+        """
+        if not schedule.stale:
+            self._writes.spawn(self.put(key, schedule))
+
+    async def close(self):
+        await self._writes.wait()
+
+
+class SharedRateLimiter:
+    """
+    Token bucket, общий для всех процессов: то же, что RateLimiter
+    (rate запросов в секунду, всплеск до burst), но состояние корзины
+    лежит в общем хранилище и резервируется атомарно.
+    Пока хранилище недоступно, действует локальный fallback (доля лимита процесса).
+    Если rate <= 0, ограничение отключено.
+    """
+
+    def __init__(self, backend, name: str, rate: float, burst: int = 1, fallback: Optional[RateLimiter] = None):
+        self.backend = backend
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.fallback = fallback if fallback is not None else RateLimiter(rate, burst)
+        self._failing = False
+
+    async def _reserve(self, wait: bool) -> Optional[float]:
+        """
+        Резервирует токен в общем хранилище. При ошибке бросает исключение,
+        но пишет в лог только первую ошибку подряд, а не каждую.
+        """
+        try:
+            delay = await self.backend.reserve(f"ratelimit:{self.name}", self.rate, self.burst, wait=wait)
+        except Exception as e:
+            if not self._failing:
+                self._failing = True
+                logger.error(f"Общий лимит запросов недоступен, действует лимит процесса: {e}")
+            raise
+        if self._failing:
+            self._failing = False
+            logger.info("Общий лимит запросов снова доступен")
+        return delay
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        try:
+            delay = await self._reserve(wait=True)
+        except Exception:
+            await self.fallback.acquire()
+            return
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def try_acquire(self) -> bool:
+        """
+        Берёт токен, только если он есть прямо сейчас.
+        """
+        if self.rate <= 0:
+            return True
+        try:
+            return await self._reserve(wait=False) is not None
+        except Exception:
+            return await self.fallback.try_acquire()
+
+
+def create_upstream_limiter(rate: float, burst: int, backend_name: str = SHARED_BACKEND, workers: int = WORKERS):
+    """
+    Лимит запросов к сайту: общий token bucket, если процессы делят Redis.
+    Без общего хранилища (local и fakeredis живут в памяти процесса) каждый
+    из workers процессов получает свою долю лимита.
+    """
+    share = RateLimiter(rate / workers, max(1, burst // workers))
+    if backend_name in ("local", "fakeredis"):
+        return share
+    # Доля процесса остаётся запасным лимитом на время недоступности Redis
+    return SharedRateLimiter(shared_backend, "upstream", rate, burst, fallback=share)
+
+
+shared_backend = create_backend()
+# В одном процессе второй уровень кэша не нужен: его роль играет обычный ScheduleCache
+shared_schedules: Optional[SharedScheduleCache] = (
+    SharedScheduleCache(shared_backend) if SHARED_BACKEND != "local" else None
+)
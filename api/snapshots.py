@@ -0,0 +1,144 @@
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from api.models import Lesson, Schedule
+from config.settings import SNAPSHOT_PATH
+from utils.sqlite import SQLiteDatabase
+from utils.tasks import BackgroundTasks
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+
+class Snapshot(NamedTuple):
+    schedule: Schedule
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.schedule.fetched_at
+
+
+def encode_schedule(schedule: Schedule) -> bytes:
+    """
+    Сжатое представление нормализованного расписания: только поля Lesson, без ответа API.
+    """
+    data = {
+        "version": schedule.version,
+        "day_versions": schedule.day_versions,
+        "fetched_at": schedule.fetched_at,
+        "days": {
+            day: [
+                [pair_num, [[l.subject, l.type, l.teacher, l.location, l.dts] for l in lessons]]
+                for pair_num, lessons in pairs
+            ]
+            for day, pairs in schedule.days.items()
+        },
+    }
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(raw)
+
+
+def decode_schedule(blob: bytes, fetched_at: Optional[float] = None, stale: bool = False) -> Schedule:
+    data = json.loads(zlib.decompress(blob).decode("utf-8"))
+    if fetched_at is None:
+        fetched_at = data.get("fetched_at", 0.0)
+    days = {
+        day: tuple(
+            (pair_num, tuple(Lesson(*fields) for fields in lessons))
+            for pair_num, lessons in pairs
+        )
+        for day, pairs in data["days"].items()
+    }
+    return Schedule(
+        ok=True,
+        days=days,
+        version=data["version"],
+        day_versions=data["day_versions"],
+        fetched_at=fetched_at,
+        stale=stale,
+    )
+
+
+class SnapshotStore:
+    """
+    Снимки последних удачно полученных расписаний в SQLite.
+    Записываются при каждом обновлении кэша, читаются по одной группе
+    при промахе кэша, поэтому после перезапуска бот не начинает с нуля,
+    а при недоступности rasp.dmami.ru есть что показать.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.db = SQLiteDatabase(
+            path,
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "grp TEXT NOT NULL, session TEXT NOT NULL, version TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, data BLOB NOT NULL, PRIMARY KEY (grp, session))",
+            thread_name="snapshots",
+        )
+        # Версии и время получения, уже записанные на диск
+        self._versions: Dict[Key, Tuple[str, float]] = {}
+        self._writes = BackgroundTasks()
+        self.stats = {"reads": 0, "found": 0, "writes": 0, "touches": 0, "errors": 0, "restored": 0, "stale_served": 0}
+
+    async def get(self, key: Key, stale: bool = False) -> Optional[Snapshot]:
+        self.stats["reads"] += 1
+        try:
+            row = await self.db.run(
+                self.db.fetchone, "SELECT data, fetched_at FROM snapshots WHERE grp = ? AND session = ?", key)
+            if row is None:
+                return None
+            schedule = decode_schedule(row[0], row[1], stale=stale)
+        except (sqlite3.Error, ValueError, KeyError, zlib.error) as e:
+            self.stats["errors"] += 1
+            logger.error(f"Не удалось прочитать снимок расписания {key}: {e}")
+            return None
+        self.stats["found"] += 1
+        self._versions[key] = (schedule.version, schedule.fetched_at)
+        return Snapshot(schedule)
+
+    async def put(self, key: Key, schedule: Schedule):
+        """
+        Сохраняет расписание. Если эта версия уже на диске, обновляет только время получения.
+        """
+        saved = self._versions.get(key)
+        if saved is not None and saved[1] >= schedule.fetched_at:
+            return
+        try:
+            if saved is not None and saved[0] == schedule.version:
+                await self.db.run(
+                    self.db.execute, "UPDATE snapshots SET fetched_at = ? WHERE grp = ? AND session = ?",
+                    (schedule.fetched_at, *key))
+                self.stats["touches"] += 1
+            else:
+                blob = encode_schedule(schedule)
+                await self.db.run(
+                    self.db.execute,
+                    "INSERT OR REPLACE INTO snapshots (grp, session, version, fetched_at, data) VALUES (?, ?, ?, ?, ?)",
+                    (*key, schedule.version, schedule.fetched_at, blob))
+                self.stats["writes"] += 1
+            self._versions[key] = (schedule.version, schedule.fetched_at)
+        except sqlite3.Error as e:
+            self.stats["errors"] += 1
+            logger.error(f"Не удалось сохранить снимок расписания {key}: {e}")
+
+    def on_schedule(self, key: Key, schedule: Schedule):
+        """
+        Обработчик обновления кэша: сохраняет свежую версию в фоне.
+        """
+        if not schedule.stale:
+            self._writes.spawn(self.put(key, schedule))
+
+    async def close(self):
+        await self._writes.wait()
+        await self.db.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "known": len(self._versions)}
+
+
+snapshot_store = SnapshotStore()
@@ -0,0 +1,63 @@
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Any, Dict
+
+from aiohttp import web
+
+from bench.fake_upstream import LocalServer
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Расписание", "username": "loadtest_bot"}
+
+
+class FakeBotAPI(LocalServer):
+    """
+    Локальная замена Telegram Bot API (/bot<token>/<method>) для нагрузочных тестов:
+    отвечает на отправку и редактирование сообщений с настраиваемой задержкой
+    и считает вызовы по методам.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        super().__init__(host, port)
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._message_id = 0
+        self.calls: Counter = Counter()
+
+    @property
+    def api_url(self) -> str:
+        return self.base_url.rstrip("/")
+
+    def _message(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        self._message_id += 1
+        chat_id = int(data.get("chat_id", 0))
+        return {
+            "message_id": int(data.get("message_id", self._message_id)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": data.get("text", ""),
+        }
+
+    async def _method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        data = dict(await request.post())
+        delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if method == "getMe":
+            result: Any = BOT_USER
+        elif method in ("sendMessage", "editMessageText"):
+            result = self._message(data)
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._method)
+        return app
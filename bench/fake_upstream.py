@@ -0,0 +1,169 @@
+import argparse
+import asyncio
+import random
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+
+from aiohttp import web
+
+from bench.generator import generate_schedule
+
+
+class LocalServer(ABC):
+    """
+    Локальный aiohttp-сервер для бенчмарков: в текущем цикле событий
+    или в отдельном потоке. Наследники описывают приложение в make_app.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/"
+
+    @abstractmethod
+    def make_app(self) -> web.Application:
+        ...
+
+    async def start(self):
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        # При port=0 порт выбирает система
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self):
+        """
+        Запускает сервер в отдельном потоке со своим циклом событий,
+        чтобы к нему можно было обращаться синхронным fetch_schedule.
+        """
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.start())
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        started.wait()
+
+    def stop_thread(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+class FakeUpstream(LocalServer):
+    """
+    Локальная замена rasp.dmami.ru: главная страница с куками и /site/group
+    с настраиваемой задержкой и долей ошибок.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        html_rate: float = 0.0,
+        pairs: int = 5,
+        lessons_per_pair: int = 3,
+        payload: Optional[Callable[[str, str], Dict[str, Any]]] = None,
+        seed: int = 0,
+    ):
+        super().__init__(host, port)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.html_rate = html_rate
+        self.pairs = pairs
+        self.lessons_per_pair = lessons_per_pair
+        self.payload = payload or self._generated_payload
+        self._rng = random.Random(seed)
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"root": 0, "api": 0, "failures": 0, "html": 0}
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.base_url}site/group"
+
+    def _generated_payload(self, group: str, session: str) -> Dict[str, Any]:
+        if group not in self._payloads:
+            self._payloads[group] = generate_schedule(
+                self.pairs, self.lessons_per_pair, seed=zlib.crc32(group.encode()))
+        return self._payloads[group]
+
+    async def _delay(self):
+        delay = self.latency + self._rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _root(self, request: web.Request) -> web.Response:
+        self.stats["root"] += 1
+        await self._delay()
+        response = web.Response(text="<html>rasp</html>", content_type="text/html")
+        response.set_cookie("session", "fake")
+        return response
+
+    async def _group(self, request: web.Request) -> web.Response:
+        self.stats["api"] += 1
+        await self._delay()
+        roll = self._rng.random()
+        if roll < self.failure_rate:
+            self.stats["failures"] += 1
+            return web.Response(status=500, text="Internal Server Error")
+        if roll < self.failure_rate + self.html_rate:
+            self.stats["html"] += 1
+            return web.Response(text="<html>login</html>", content_type="text/html")
+        group = request.query.get("group", "")
+        session = request.query.get("session", "0")
+        return web.json_response(self.payload(group, session))
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/", self._root)
+        app.router.add_get("/site/group", self._group)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена rasp.dmami.ru")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа, сек")
+    parser.add_argument("--jitter", type=float, default=0.02, help="разброс задержки, сек")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--html-rate", type=float, default=0.0, help="доля ответов HTML вместо JSON")
+    parser.add_argument("--pairs", type=int, default=5)
+    parser.add_argument("--lessons-per-pair", type=int, default=3)
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(
+        host=args.host, port=args.port, latency=args.latency, jitter=args.jitter,
+        failure_rate=args.failure_rate, html_rate=args.html_rate,
+        pairs=args.pairs, lessons_per_pair=args.lessons_per_pair,
+    )
+    web.run_app(upstream.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+import random
+from typing import Any, Dict, List
+
+from config.settings import SCHEDULE_TIMES, WEEK_DAYS
+
+MONTHS = ["янв", "фев", "мар", "апр", "май", "июн", "июл", "авг", "сен", "окт", "ноя", "дек"]
+SUBJECTS = [
+    "Математический анализ", "Линейная алгебра", "Физика", "Программирование",
+    "Базы данных", "Иностранный язык", "Физическая культура", "Философия",
+    "Операционные системы", "Компьютерные сети", "Теория вероятностей",
+]
+TYPES = ["Лекция", "Практика", "Лабораторная работа"]
+TEACHERS = [
+    "Иванов Иван Иванович", "Петрова Анна Сергеевна", "Сидоров Пётр Алексеевич",
+    "Кузнецова Мария Игоревна", "Смирнов Олег Викторович", "",
+]
+LOCATIONS = ["Пр2301", "Ав4805", "Б-402", "Н-310", "Онлайн", "webinar", "Пк-101"]
+
+# Размеры расписаний для бенчмарков: (пар в день, занятий в паре)
+SIZES = {
+    "small": (3, 1),
+    "medium": (5, 3),
+    "large": (7, 8),
+}
+
+
+def _date(rng: random.Random) -> str:
+    return f"{rng.randint(1, 28):02d} {rng.choice(MONTHS)}"
+
+
+def random_dts(rng: random.Random) -> str:
+    """
+    Случайное поле dts: диапазоны (в том числе через Новый год),
+    одиночные даты, пустые и некорректные значения.
+    """
+    kind = rng.random()
+    if kind < 0.6:
+        return f"{_date(rng)} - {_date(rng)}"
+    if kind < 0.8:
+        return _date(rng)
+    if kind < 0.9:
+        return "Не указано"
+    if kind < 0.95:
+        return ""
+    return "когда-нибудь"
+
+
+def generate_lesson(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "sbj": rng.choice(SUBJECTS),
+        "type": rng.choice(TYPES),
+        "teacher": rng.choice(TEACHERS),
+        "location": rng.choice(LOCATIONS),
+        "dts": random_dts(rng),
+    }
+
+
+def generate_schedule(pairs: int = 5, lessons_per_pair: int = 3, seed: int = 0) -> Dict[str, Any]:
+    """
+    Генерирует ответ API rasp.dmami.ru в формате {"status": "ok", "grid": {...}}.
+    """
+    rng = random.Random(seed)
+    pair_nums = list(SCHEDULE_TIMES)[:pairs]
+    grid = {}
+    for day in WEEK_DAYS:
+        grid[day] = {
+            pair: [generate_lesson(rng) for _ in range(rng.randint(0, lessons_per_pair))]
+            for pair in pair_nums
+        }
+    return {"status": "ok", "grid": grid}
+
+
+def generate_dts_list(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [random_dts(rng) for _ in range(count)]
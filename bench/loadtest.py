@@ -0,0 +1,358 @@
+"""
+Нагрузочный тест бота целиком: настоящий Dispatcher из bot/telegram_bot.py,
+локальные замены Telegram Bot API и rasp.dmami.ru и поток обновлений от
+синтетических пользователей (/start, /чепопарам <группа>, кнопки дней).
+Популярность групп распределена по закону Ципфа: несколько групп
+запрашивают постоянно, большинство — изредка.
+
+Запуск из корня проекта:
+    python -m bench.loadtest --users 5000 --rate 200 --duration 60
+    python -m bench.loadtest --no-send-limits --output bench/loadtest.json --max-p99 500
+
+Остальные параметры бота (UPSTREAM_RPS, SCHEDULE_CACHE_TTL, NAVIGATION_MODE и т.д.)
+берутся из переменных окружения, как при обычном запуске.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+
+from bench.fake_telegram import FakeBotAPI
+from bench.fake_upstream import FakeUpstream
+from config import settings
+
+Result = Dict[str, float]
+
+KINDS = ("start", "schedule", "day")
+
+
+def percentiles(samples: List[float]) -> Result:
+    """
+    p50/p95/p99 и максимум в миллисекундах.
+    """
+    if not samples:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "count": 0}
+    ordered = sorted(samples)
+
+    def at(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+    return {"p50_ms": at(0.5), "p95_ms": at(0.95), "p99_ms": at(0.99), "max_ms": ordered[-1] * 1000, "count": len(ordered)}
+
+
+def rss_bytes() -> int:
+    """
+    Текущий RSS процесса (на Linux), иначе пиковый.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # В macOS ru_maxrss в байтах, в Linux — в килобайтах
+        return usage if sys.platform == "darwin" else usage * 1024
+
+
+def group_names(count: int) -> List[str]:
+    return [f"{241 + i // 900}-{100 + i % 900}" for i in range(count)]
+
+
+class Population:
+    """
+    Синтетические пользователи: у каждого своя группа (по кривой популярности)
+    и свой чат. next_update выбирает случайного пользователя и действие по mix.
+    """
+
+    def __init__(
+        self,
+        users: int,
+        groups: int,
+        zipf: float,
+        mix: Dict[str, float],
+        keyboard: Callable[[str], Any],
+        seed: int = 0,
+    ):
+        self.rng = random.Random(seed)
+        self.groups = group_names(groups)
+        weights = [1 / rank ** zipf for rank in range(1, groups + 1)]
+        self.user_groups = self.rng.choices(self.groups, weights, k=users)
+        self.kinds = [kind for kind in KINDS if mix.get(kind, 0) > 0]
+        self.kind_weights = [mix[kind] for kind in self.kinds]
+        self.keyboard = keyboard
+        self._buttons: Dict[str, List[str]] = {}
+        self.update_id = 0
+        self.seen = set()
+
+    def _buttons_for(self, group: str) -> List[str]:
+        # Данные кнопок берём из клавиатур самого бота, чтобы формат всегда совпадал
+        buttons = self._buttons.get(group)
+        if buttons is None:
+            markup = self.keyboard(group)
+            buttons = [button.callback_data for row in markup.inline_keyboard for button in row if button.callback_data]
+            self._buttons[group] = buttons
+        return buttons
+
+    def _message(self, chat_id: int, text: str) -> Dict[str, Any]:
+        command = text.split()[0]
+        return {
+            "message_id": self.update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Студент"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        }
+
+    def next_update(self) -> Tuple[str, Dict[str, Any]]:
+        self.update_id += 1
+        user = self.rng.randrange(len(self.user_groups))
+        self.seen.add(user)
+        chat_id = 10_000_000 + user
+        group = self.user_groups[user]
+        kind = self.rng.choices(self.kinds, self.kind_weights)[0]
+
+        if kind == "start":
+            return kind, {"update_id": self.update_id, "message": self._message(chat_id, "/start")}
+        if kind == "schedule":
+            return kind, {"update_id": self.update_id, "message": self._message(chat_id, f"/чепопарам {group}")}
+        message = self._message(chat_id, f"📅 Расписание группы {group}")
+        message["from"] = {"id": 123456, "is_bot": True, "first_name": "Расписание"}
+        del message["entities"]
+        callback = {
+            "id": str(self.update_id),
+            "chat_instance": str(chat_id),
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Студент"},
+            "message": message,
+            "data": self.rng.choice(self._buttons_for(group)),
+        }
+        return kind, {"update_id": self.update_id, "callback_query": callback}
+
+
+async def monitor_lag(samples: List[float], interval: float = 0.01):
+    """
+    Задержка цикла событий: насколько позже запланированного просыпается sleep(interval).
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+async def drive(dp, bot, population: Population, rate: float, duration: float) -> Dict[str, Any]:
+    """
+    Подаёт обновления в dp с пуассоновским потоком rate в секунду в течение duration секунд.
+    Каждое обновление обрабатывается отдельной задачей, как при long polling.
+    """
+    from aiogram.types import Update
+
+    loop = asyncio.get_running_loop()
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Counter = Counter()
+    tasks = set()
+    inflight = {"now": 0, "peak": 0}
+
+    async def handle(kind: str, update: Update):
+        inflight["now"] += 1
+        inflight["peak"] = max(inflight["peak"], inflight["now"])
+        started = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            errors[kind] += 1
+        finally:
+            latencies[kind].append(time.perf_counter() - started)
+            inflight["now"] -= 1
+
+    started = loop.time()
+    next_at = started
+    sent = 0
+    while True:
+        next_at += population.rng.expovariate(rate)
+        if next_at >= started + duration:
+            break
+        delay = next_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, raw = population.next_update()
+        task = asyncio.create_task(handle(kind, Update.model_validate(raw)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        sent += 1
+
+    submitted = loop.time() - started
+    if tasks:
+        await asyncio.gather(*tasks)
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "sent": sent,
+        "peak_inflight": inflight["peak"],
+        "submit_seconds": submitted,
+        "total_seconds": loop.time() - started,
+    }
+
+
+def configure_environment(args, api: FakeBotAPI, upstream: FakeUpstream, data_dir: str):
+    """
+    Направляет бота на локальные заглушки. Вызывается до импорта бота:
+    настройки читаются из окружения при импорте config.settings.
+    """
+    os.environ["TELEGRAM_TOKEN"] = "123456:loadtest"
+    os.environ["TELEGRAM_API_URL"] = api.api_url
+    os.environ["SCHEDULE_BASE_URL"] = upstream.base_url
+    os.environ["DATA_DIR"] = data_dir
+    os.environ["FSM_STORAGE"] = "memory"
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.setdefault("PREFETCH_ENABLED", "0")
+    if args.no_send_limits:
+        # Без лимитов отправки замеряется сам бот, а не ожидание token bucket
+        os.environ["SEND_GLOBAL_RPS"] = "0"
+        os.environ["SEND_CHAT_RPS"] = "0"
+    # config.settings уже импортирован генератором расписаний (ради WEEK_DAYS): перечитываем
+    importlib.reload(settings)
+
+
+async def run(args, api: FakeBotAPI, upstream: FakeUpstream) -> Dict[str, Any]:
+    from bot import telegram_bot as app
+
+    keyboard = app.create_nav_buttons if settings.NAVIGATION_MODE == "edit" else app.create_day_buttons
+    mix = {"start": args.start_share, "schedule": args.schedule_share, "day": args.day_share}
+    population = Population(args.users, args.groups, args.zipf, mix, keyboard, seed=args.seed)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+    rss_before = rss_bytes()
+    lag: List[float] = []
+    monitor = asyncio.create_task(monitor_lag(lag))
+    try:
+        # Те же фоновые службы и ресурсы, что при обычном запуске (main в bot/telegram_bot.py)
+        async with app.background_services():
+            outcome = await drive(app.dp, app.bot, population, args.rate, args.duration)
+    finally:
+        monitor.cancel()
+        await app.bot.session.close()
+    rss_after = rss_bytes()
+    heap_after = tracemalloc.get_traced_memory()[0] if args.tracemalloc else 0
+
+    users_seen = max(1, len(population.seen))
+    all_latencies = [sample for samples in outcome["latencies"].values() for sample in samples]
+    report = {
+        "latency": {"all": percentiles(all_latencies)},
+        "loop_lag": percentiles(lag),
+        "throughput": {
+            "updates": outcome["sent"],
+            "updates_per_sec": outcome["sent"] / outcome["total_seconds"],
+            "peak_inflight": outcome["peak_inflight"],
+            "drain_seconds": outcome["total_seconds"] - outcome["submit_seconds"],
+        },
+        "memory": {
+            "rss_before_mb": rss_before / 2 ** 20,
+            "rss_after_mb": rss_after / 2 ** 20,
+            "users": len(population.seen),
+            "rss_per_user_kb": (rss_after - rss_before) / users_seen / 1024,
+        },
+        "upstream": {
+            "requests": upstream.stats["api"],
+            "cookie_requests": upstream.stats["root"],
+            "failures": upstream.stats["failures"],
+            "per_1000_updates": upstream.stats["api"] * 1000 / max(1, outcome["sent"]),
+            "groups_requested": len({population.user_groups[user] for user in population.seen}),
+        },
+        "telegram": dict(api.calls),
+        "errors": dict(outcome["errors"]),
+    }
+    for kind, samples in outcome["latencies"].items():
+        report["latency"][kind] = percentiles(samples)
+    if args.tracemalloc:
+        report["memory"]["heap_per_user_kb"] = (heap_after - heap_before) / users_seen / 1024
+        tracemalloc.stop()
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{'задержка обработки':<20} {'p50, мс':>10} {'p95, мс':>10} {'p99, мс':>10} {'макс, мс':>10} {'штук':>8}")
+    rows = [(name, result) for name, result in report["latency"].items()] + [("лаг цикла событий", report["loop_lag"])]
+    for name, result in rows:
+        print(f"{name:<20} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f} {result['p99_ms']:>10.2f} "
+              f"{result['max_ms']:>10.2f} {result['count']:>8}")
+
+    throughput, memory, upstream = report["throughput"], report["memory"], report["upstream"]
+    print(f"\nобновлений: {throughput['updates']} ({throughput['updates_per_sec']:.1f}/с), "
+          f"одновременно до {throughput['peak_inflight']}, дообработка {throughput['drain_seconds']:.2f} с")
+    print(f"память: {memory['rss_before_mb']:.1f} -> {memory['rss_after_mb']:.1f} МБ RSS, "
+          f"{memory['rss_per_user_kb']:.2f} КБ на пользователя ({memory['users']} польз.)"
+          + (f", куча {memory['heap_per_user_kb']:.2f} КБ на пользователя" if "heap_per_user_kb" in memory else ""))
+    print(f"rasp.dmami.ru: {upstream['requests']} запросов ({upstream['per_1000_updates']:.1f} на 1000 обновлений), "
+          f"групп {upstream['groups_requested']}, ошибок {upstream['failures']}")
+    print(f"Bot API: {', '.join(f'{method} {count}' for method, count in sorted(report['telegram'].items()))}")
+    if report["errors"]:
+        print(f"ошибки обработки: {report['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с заглушками Telegram и rasp.dmami.ru")
+    parser.add_argument("--users", type=int, default=2000, help="число пользователей")
+    parser.add_argument("--groups", type=int, default=300, help="число групп")
+    parser.add_argument("--zipf", type=float, default=1.1, help="показатель кривой популярности групп")
+    parser.add_argument("--rate", type=float, default=100, help="обновлений в секунду")
+    parser.add_argument("--duration", type=float, default=30, help="длительность, сек")
+    parser.add_argument("--start-share", type=float, default=0.05, help="доля /start")
+    parser.add_argument("--schedule-share", type=float, default=0.35, help="доля /чепопарам <группа>")
+    parser.add_argument("--day-share", type=float, default=0.6, help="доля нажатий кнопок дней")
+    parser.add_argument("--upstream-latency", type=float, default=0.1, help="задержка rasp.dmami.ru, сек")
+    parser.add_argument("--upstream-failure-rate", type=float, default=0.0)
+    parser.add_argument("--telegram-latency", type=float, default=0.03, help="задержка Bot API, сек")
+    parser.add_argument("--no-send-limits", action="store_true", help="отключить лимиты отправки в Telegram")
+    parser.add_argument("--tracemalloc", action="store_true", help="дополнительно мерить кучу Python (медленнее)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="файл для сохранения результатов (JSON)")
+    parser.add_argument("--max-p99", type=float, help="код возврата 1, если p99 обработки больше (мс)")
+    args = parser.parse_args()
+
+    # Заглушки работают в своих потоках, чтобы не искажать лаг цикла событий бота
+    upstream = FakeUpstream(latency=args.upstream_latency, jitter=args.upstream_latency / 4,
+                            failure_rate=args.upstream_failure_rate, seed=args.seed)
+    api = FakeBotAPI(latency=args.telegram_latency, jitter=args.telegram_latency / 4, seed=args.seed)
+    upstream.start_in_thread()
+    api.start_in_thread()
+    try:
+        with tempfile.TemporaryDirectory(prefix="loadtest-") as data_dir:
+            configure_environment(args, api, upstream, data_dir)
+            logging.disable(logging.CRITICAL)
+            report = asyncio.run(run(args, api, upstream))
+    finally:
+        api.stop_thread()
+        upstream.stop_thread()
+
+    print_report(report)
+
+    if args.output:
+        report["meta"] = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.max_p99 is not None and report["latency"]["all"]["p99_ms"] > args.max_p99:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
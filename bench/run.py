@@ -0,0 +1,218 @@
+"""
+Бенчмарки горячих путей бота.
+
+Запуск из корня проекта:
+    python -m bench.run --output bench/results.json
+    python -m bench.run --compare bench/baseline.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from api import schedule as schedule_api
+from api.client import ScheduleClient
+from api.models import normalize_schedule
+from api.ratelimit import RateLimiter
+from bench.fake_upstream import FakeUpstream
+from bench.generator import SIZES, generate_dts_list, generate_schedule
+from bot.render import split_message
+
+Result = Dict[str, float]
+
+
+def _summary(samples: List[float], ops_per_sample: int = 1) -> Result:
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    median = statistics.median(samples)
+    return {
+        "median_ms": median * 1000,
+        "p95_ms": p95 * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "ops_per_sec": ops_per_sample / median if median else 0.0,
+        "samples": len(samples),
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int, ops_per_sample: int = 1) -> Result:
+    func()  # прогрев
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return _summary(samples, ops_per_sample)
+
+
+async def measure_async(func: Callable[[], Any], repeat: int) -> Result:
+    await func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return _summary(samples)
+
+
+def bench_dates(repeat: int) -> Dict[str, Result]:
+    dts_list = generate_dts_list(1000, seed=1)
+    now = datetime.now()
+    return {
+        "is_date_range_valid[x1000]": measure(
+            lambda: [schedule_api.is_date_range_valid(dts, now) for dts in dts_list],
+            repeat, ops_per_sample=len(dts_list)),
+    }
+
+
+def bench_cpu(size: str, repeat: int) -> Dict[str, Result]:
+    pairs, lessons = SIZES[size]
+    raw = generate_schedule(pairs, lessons, seed=1)
+    normalized = normalize_schedule(raw)
+    text = schedule_api.format_schedule(normalized)
+
+    return {
+        f"normalize_schedule[{size}]": measure(lambda: normalize_schedule(raw), repeat),
+        f"format_schedule_raw[{size}]": measure(lambda: schedule_api.format_schedule(raw), repeat),
+        f"format_schedule[{size}]": measure(lambda: schedule_api.format_schedule(normalized), repeat),
+        f"format_schedule_day[{size}]": measure(
+            lambda: schedule_api.format_schedule(normalized, selected_day="1"), repeat),
+        f"split_message[{size}]": measure(
+            lambda: split_message(text * 3, header="📅 Понедельник (группа 241-335):\n\n"), repeat),
+    }
+
+
+def bench_fetch_sync(upstream: FakeUpstream, repeat: int) -> Dict[str, Result]:
+    def fetch():
+        # Ошибки фейкового сервера (--failure-rate) тоже входят в замер
+        try:
+            schedule_api.fetch_schedule("241-335")
+        except Exception:
+            pass
+
+    # fetch_schedule читает адреса из глобальных переменных модуля
+    original = schedule_api.BASE_URL, schedule_api.API_URL
+    schedule_api.BASE_URL, schedule_api.API_URL = upstream.base_url, upstream.api_url
+    try:
+        return {"fetch_schedule[sync]": measure(fetch, repeat)}
+    finally:
+        schedule_api.BASE_URL, schedule_api.API_URL = original
+
+
+async def bench_fetch_async(upstream: FakeUpstream, repeat: int, concurrency: int) -> Dict[str, Result]:
+    client = ScheduleClient(
+        base_url=upstream.base_url, api_url=upstream.api_url, rate_limiter=RateLimiter(0))
+    async def fetch():
+        try:
+            await client.fetch_schedule("241-335")
+        except Exception:
+            pass
+
+    try:
+        single = await measure_async(fetch, repeat)
+
+        async def batch():
+            await asyncio.gather(
+                *(client.fetch_schedule(f"241-{i:03d}") for i in range(concurrency)),
+                return_exceptions=True,
+            )
+
+        batch_result = await measure_async(batch, max(1, repeat // 5))
+        batch_result["ops_per_sec"] = concurrency * 1000 / batch_result["median_ms"]
+        return {
+            "fetch_schedule_async": single,
+            f"fetch_schedule_async[x{concurrency}]": batch_result,
+        }
+    finally:
+        await client.close()
+
+
+def compare(results: Dict[str, Result], baseline_path: str, threshold: float) -> bool:
+    """
+    Сравнивает медианы с сохранёнными результатами. Возвращает False при регрессии.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+
+    ok = True
+    print(f"\n{'бенчмарк':<36} {'было, мс':>10} {'стало, мс':>10} {'изменение':>10}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["median_ms"]
+        after = result["median_ms"]
+        change = (after - before) / before if before else 0.0
+        mark = ""
+        if change > threshold:
+            mark = "  <-- регрессия"
+            ok = False
+        print(f"{name:<36} {before:>10.3f} {after:>10.3f} {change:>+9.1%}{mark}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки расписания")
+    parser.add_argument("--sizes", default=",".join(SIZES), help="размеры расписаний через запятую")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка фейкового сервера, сек")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=20, help="параллельных запросов в async-бенчмарке")
+    parser.add_argument("--skip-network", action="store_true", help="не запускать бенчмарки fetch_schedule")
+    parser.add_argument("--output", help="файл для сохранения результатов (JSON)")
+    parser.add_argument("--compare", help="файл с результатами для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="допустимое замедление медианы")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+
+    results = bench_dates(args.repeat)
+    for size in args.sizes.split(","):
+        results.update(bench_cpu(size.strip(), args.repeat))
+
+    if not args.skip_network:
+        upstream = FakeUpstream(latency=args.latency, failure_rate=args.failure_rate)
+        upstream.start_in_thread()
+        try:
+            results.update(bench_fetch_sync(upstream, args.repeat))
+        finally:
+            upstream.stop_thread()
+
+        async def run_async():
+            async_upstream = FakeUpstream(latency=args.latency, failure_rate=args.failure_rate)
+            await async_upstream.start()
+            try:
+                return await bench_fetch_async(async_upstream, args.repeat, args.concurrency)
+            finally:
+                await async_upstream.stop()
+
+        results.update(asyncio.run(run_async()))
+
+    print(f"{'бенчмарк':<36} {'медиана, мс':>12} {'p95, мс':>10} {'оп/с':>12}")
+    for name, result in results.items():
+        print(f"{name:<36} {result['median_ms']:>12.3f} {result['p95_ms']:>10.3f} {result['ops_per_sec']:>12.1f}")
+
+    if args.output:
+        report = {
+            "meta": {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "repeat": args.repeat,
+                "latency": args.latency,
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.compare and not compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+from aiogram.filters.callback_data import CallbackData
+
+
+class DayCallback(CallbackData, prefix="d1"):
+    """
+    Данные кнопки дня недели: группа, день и тип расписания.
+    Запакованы прямо в callback_data (например, "d1:241-335:3:0"),
+    поэтому нажатие обрабатывается без чтения FSM, в том числе после
+    перезапуска бота. Цифра в префиксе — версия формата: при его
+    изменении старые кнопки просто не совпадут с новым фильтром.
+    """
+    group: str
+    day: str
+    session: str = "0"
+
+
+# Кнопки старого формата "day_{num}", оставшиеся в чатах до перехода на DayCallback
+LEGACY_DAY_PREFIX = "day_"
+
+
+class NavCallback(CallbackData, prefix="n1"):
+    """
+    Данные кнопок навигации по неделе в режиме редактирования одного сообщения.
+    day — номер дня или TODAY: текущий день определяется в момент нажатия.
+    """
+    group: str
+    day: str
+    session: str = "0"
+
+
+TODAY = "t"
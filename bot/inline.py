@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import re
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional, Set
+
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+
+from api.cache import schedule_cache
+from api.groups import group_catalog, unknown_groups
+from api.metrics import REGISTRY
+from api.models import Schedule, day_key
+from api.schedule import NOT_FOUND, get_schedule
+from bot.render import render_day
+from config.settings import WEEK_DAYS, INLINE_CACHE_TIME, INLINE_DEBOUNCE, INLINE_LOAD_WAIT, INLINE_RESULTS_CACHE_SIZE
+from utils.cache import DailyCache
+
+logger = logging.getLogger(__name__)
+
+# Полный номер группы: дальше него пользователь уже не допечатывает
+GROUP_RE = re.compile(r"\d{3}-\d{3,4}")
+
+# Приписка к расписанию, не поместившемуся в одно сообщение (части не длиннее
+# MAX_MESSAGE_LENGTH, поэтому с ней текст остаётся в пределах лимита Telegram)
+TRUNCATED_NOTICE = "\n… расписание не поместилось целиком, полностью: "
+
+SHORT_DAYS = {"пн": "1", "вт": "2", "ср": "3", "чт": "4", "пт": "5", "сб": "6"}
+RELATIVE_DAYS = {"сегодня": 0, "завтра": 1}
+
+
+class InlineRequest(NamedTuple):
+    group: str
+    # Номер дня или None, если день не указан (показываем всю неделю)
+    day: Optional[str]
+    complete: bool
+
+
+def parse_day(token: str, today: date) -> Optional[str]:
+    """
+    Понимает «пт», «пятн», «пятница», «5», «сегодня» и «завтра».
+    """
+    token = token.lower().strip(".,")
+    if token in SHORT_DAYS:
+        return SHORT_DAYS[token]
+    if token in WEEK_DAYS:
+        return token
+    if token in RELATIVE_DAYS:
+        weekday = str((today + timedelta(days=RELATIVE_DAYS[token])).isoweekday())
+        # В воскресенье показываем понедельник
+        return weekday if weekday in WEEK_DAYS else next(iter(WEEK_DAYS))
+    if len(token) >= 2:
+        for day_num, day_name in WEEK_DAYS.items():
+            if day_name.lower().startswith(token):
+                return day_num
+    return None
+
+
+def parse_query(text: str, today: date) -> Optional[InlineRequest]:
+    """
+    Разбирает inline-запрос вида «241-335 пт» по мере набора.
+    Возвращает None, если это не номер группы.
+    """
+    tokens = text.split()
+    if not tokens or not tokens[0].replace("-", "").isdigit():
+        return None
+    group = tokens[0]
+    day = parse_day(tokens[1], today) if len(tokens) > 1 else None
+    complete = bool(GROUP_RE.fullmatch(group)) or group in group_catalog
+    return InlineRequest(group, day, complete)
+
+
+class LatestQueries:
+    """
+    Последний inline-запрос каждого пользователя и счётчики запросов. Telegram
+    присылает запрос на каждое нажатие клавиши, и устаревшие не стоит доводить
+    до запроса к сайту.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._latest: "OrderedDict[int, str]" = OrderedDict()
+        self.stats = {"queries": 0, "partial": 0, "cached": 0, "loads": 0, "dropped": 0}
+
+    def mark(self, user_id: int, query_id: str):
+        self._latest[user_id] = query_id
+        self._latest.move_to_end(user_id)
+        while len(self._latest) > self.maxsize:
+            self._latest.popitem(last=False)
+
+    def is_latest(self, user_id: int, query_id: str) -> bool:
+        return self._latest.get(user_id) == query_id
+
+
+latest_queries = LatestQueries()
+# Готовые наборы результатов: (группа, день, версия, stale) -> статьи
+results_cache: "DailyCache[List[InlineQueryResultArticle]]" = DailyCache(INLINE_RESULTS_CACHE_SIZE)
+_loads: Set[asyncio.Task] = set()
+
+
+def _article(id: str, title: str, text: str, description: Optional[str] = None) -> InlineQueryResultArticle:
+    return InlineQueryResultArticle(
+        id=id,
+        title=title,
+        description=description,
+        input_message_content=InputTextMessageContent(message_text=text),
+    )
+
+
+def group_articles(groups: List[str]) -> List[InlineQueryResultArticle]:
+    return [
+        _article(group, f"Группа {group}", f"/чепопарам {group}", "Показать расписание")
+        for group in groups
+    ]
+
+
+def day_articles(schedule: Schedule, group: str, day: Optional[str], today: date) -> List[InlineQueryResultArticle]:
+    """
+    Статьи с расписанием на выбранный день или на все дни начиная с сегодняшнего.
+    Собираются из кэша готовых сообщений и сами кэшируются до смены версии или даты.
+    """
+    key = (group, day, schedule.version, schedule.stale)
+    results = results_cache.get(key, today)
+    if results is not None:
+        return results
+
+    if day is not None:
+        days = [day]
+    else:
+        days = list(WEEK_DAYS)
+        weekday = str(today.isoweekday())
+        if weekday in days:
+            index = days.index(weekday)
+            days = days[index:] + days[:index]
+
+    actual_key = day_key(today)
+    results = []
+    for day_num in days:
+        pairs = sum(
+            1 for _, lessons in schedule.days.get(day_num, ())
+            if any(lesson.is_actual(actual_key) for lesson in lessons)
+        )
+        title = f"{WEEK_DAYS.get(day_num, day_num)} — {group}"
+        if day_num == str(today.isoweekday()):
+            title += " (сегодня)"
+        parts = render_day(schedule, group, day_num)
+        text = parts[0]
+        if len(parts) > 1:
+            # Inline-ответ — одно сообщение: остальное можно получить командой
+            text += f"{TRUNCATED_NOTICE}/чепопарам {group}"
+        results.append(_article(f"{group}:{day_num}:{schedule.version}", title, text, f"Пар: {pairs}"))
+
+    results_cache.set(key, results, today)
+    return results
+
+
+def _start_load(group: str) -> asyncio.Task:
+    task = asyncio.ensure_future(get_schedule(group=group, session="0"))
+    _loads.add(task)
+    task.add_done_callback(_loaded)
+    return task
+
+
+def _loaded(task: asyncio.Task):
+    _loads.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Не удалось загрузить расписание для inline-запроса: {task.exception()}")
+
+
+async def answer_inline(inline_query: InlineQuery):
+    """
+    Отвечает на inline-запрос только из кэша. Пока номер группы не дописан,
+    предлагает группы из каталога. К сайту обращаемся лишь для полного номера,
+    которого нет в кэше, и только если это последний запрос пользователя.
+    """
+    stats = latest_queries.stats
+    stats["queries"] += 1
+    user_id = inline_query.from_user.id
+    latest_queries.mark(user_id, inline_query.id)
+    today = date.today()
+
+    request = parse_query(inline_query.query, today)
+    if request is None:
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME, is_personal=False)
+        return
+    if not request.complete:
+        stats["partial"] += 1
+        groups = group_catalog.complete(request.group, limit=20)
+        await inline_query.answer(group_articles(groups), cache_time=INLINE_CACHE_TIME, is_personal=False)
+        return
+
+    key = (request.group, "0")
+    if key in unknown_groups:
+        unknown_groups.hits += 1
+        schedule = NOT_FOUND
+    else:
+        schedule = schedule_cache.get(key)
+    if schedule is None:
+        # Пока ждём, пользователь мог допечатать запрос: тогда этот уже не нужен
+        await asyncio.sleep(INLINE_DEBOUNCE)
+        if not latest_queries.is_latest(user_id, inline_query.id):
+            stats["dropped"] += 1
+            return
+        stats["loads"] += 1
+        try:
+            schedule = await asyncio.wait_for(asyncio.shield(_start_load(request.group)), INLINE_LOAD_WAIT)
+        except Exception:
+            schedule = None
+        if schedule is None:
+            # Ответ короткоживущий: следующий запрос уже найдёт расписание в кэше
+            await inline_query.answer(
+                [_article(f"{request.group}:wait", "Загружаю расписание…", f"/чепопарам {request.group}")],
+                cache_time=0, is_personal=False,
+            )
+            return
+    elif schedule.ok:
+        stats["cached"] += 1
+
+    if not schedule.ok:
+        text = f"Группа {request.group} не найдена."
+        await inline_query.answer(
+            [_article(f"{request.group}:missing", text.rstrip("."), text)],
+            cache_time=INLINE_CACHE_TIME, is_personal=False,
+        )
+        return
+
+    results = day_articles(schedule, request.group, request.day, today)
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=False)
+
+
+REGISTRY.stats("telegram_inline", "Статистика inline-запросов", lambda: latest_queries.stats)
+REGISTRY.stats("telegram_inline_results", "Статистика кэша готовых inline-ответов", results_cache.stats)
@@ -0,0 +1,222 @@
+import asyncio
+import logging
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from api.diff import diff_schedules, format_changes
+from api.metrics import REGISTRY
+from api.models import Schedule
+from api.prefetch import PrefetchScheduler
+from api.schedule import schedule_cache, prefetcher
+from api.snapshots import SnapshotStore, snapshot_store
+from bot.render import Parts, split_message
+from bot.sender import sender
+from config.settings import SUBSCRIPTIONS_PATH, NOTIFY_QUEUE_SIZE, NOTIFY_CONCURRENCY, SNAPSHOT_ENABLED
+from utils.sqlite import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+Key = Tuple[str, str]
+
+
+class SubscriptionStore:
+    """
+    Подписки чатов на изменения расписания групп в SQLite.
+    В памяти держится копия «группа -> чаты», чтобы при каждом обновлении
+    кэша проверка «есть ли подписчики» не ходила в базу.
+    """
+
+    def __init__(self, path: str = SUBSCRIPTIONS_PATH):
+        self.db = SQLiteDatabase(
+            path,
+            "CREATE TABLE IF NOT EXISTS subscriptions ("
+            "chat_id INTEGER NOT NULL, grp TEXT NOT NULL, session TEXT NOT NULL, "
+            "PRIMARY KEY (chat_id, grp, session))",
+            thread_name="subscriptions",
+        )
+        self._by_group: Dict[Key, Set[int]] = {}
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._by_group
+
+    def __len__(self) -> int:
+        return sum(len(chats) for chats in self._by_group.values())
+
+    async def load(self, shard: int = 0, shards: int = 1):
+        """
+        Загружает подписки. При нескольких процессах каждый берёт только свои чаты
+        (chat_id % shards == shard): им он и рассылает уведомления.
+        """
+        self._by_group.clear()
+        rows = await self.db.run(self.db.fetchall, "SELECT chat_id, grp, session FROM subscriptions")
+        for chat_id, group, session in rows:
+            if chat_id % shards == shard:
+                self._by_group.setdefault((group, session), set()).add(chat_id)
+        logger.info(f"Загружено подписок: {len(self)} на {len(self._by_group)} групп")
+
+    async def add(self, chat_id: int, key: Key) -> bool:
+        chats = self._by_group.setdefault(key, set())
+        if chat_id in chats:
+            return False
+        chats.add(chat_id)
+        await self.db.run(
+            self.db.execute,
+            "INSERT OR IGNORE INTO subscriptions (chat_id, grp, session) VALUES (?, ?, ?)",
+            (chat_id, *key),
+        )
+        return True
+
+    async def remove(self, chat_id: int, key: Key) -> bool:
+        chats = self._by_group.get(key)
+        if not chats or chat_id not in chats:
+            return False
+        chats.discard(chat_id)
+        if not chats:
+            del self._by_group[key]
+        await self.db.run(
+            self.db.execute,
+            "DELETE FROM subscriptions WHERE chat_id = ? AND grp = ? AND session = ?",
+            (chat_id, *key),
+        )
+        return True
+
+    def subscribers(self, key: Key) -> List[int]:
+        return list(self._by_group.get(key, ()))
+
+    def groups(self) -> List[Key]:
+        return list(self._by_group)
+
+    def chat_groups(self, chat_id: int) -> List[Key]:
+        return sorted(key for key, chats in self._by_group.items() if chat_id in chats)
+
+    async def close(self):
+        await self.db.close()
+
+
+class ChangeNotifier:
+    """
+    Рассылка изменений расписания подписчикам.
+    При каждой записи в кэш сравнивает новую версию расписания группы с предыдущей
+    (неизменившиеся дни пропускаются по хэшу), формирует одно короткое уведомление
+    на группу и ставит его в ограниченную очередь. Рассылка идёт через общий
+    MessageSender с ограниченным числом одновременных отправок.
+    """
+
+    def __init__(
+        self,
+        store: SubscriptionStore,
+        scheduler: PrefetchScheduler,
+        queue_size: int = NOTIFY_QUEUE_SIZE,
+        concurrency: int = NOTIFY_CONCURRENCY,
+        snapshots: Optional[SnapshotStore] = None,
+    ):
+        self.store = store
+        self.scheduler = scheduler
+        self.snapshots = snapshots
+        self.concurrency = concurrency
+        self._previous: Dict[Key, Schedule] = {}
+        self._queue: "asyncio.Queue[Tuple[Key, Parts]]" = asyncio.Queue(maxsize=queue_size)
+        self.stats = {"changes": 0, "notifications": 0, "dropped": 0, "failed": 0, "unsubscribed": 0}
+
+    async def load(self, shard: int = 0, shards: int = 1):
+        """
+        Загружает подписки и точки отсчёта для сравнения. Последняя версия до
+        перезапуска берётся из снимков на диске, иначе изменения, сделанные,
+        пока бот был выключен, молча стали бы новой точкой отсчёта.
+        """
+        await self.store.load(shard, shards)
+        for key in self.store.groups():
+            self.scheduler.pin(key)
+            if self.snapshots is not None and key not in self._previous:
+                snapshot = await self.snapshots.get(key)
+                if snapshot is not None:
+                    self._previous[key] = snapshot.schedule
+
+    def on_schedule(self, key: Key, schedule: Schedule):
+        """
+        Обработчик обновления кэша. Для групп без подписчиков ничего не делает.
+        """
+        if key not in self.store or schedule.stale:
+            return
+        previous = self._previous.get(key)
+        self._previous[key] = schedule
+        if previous is None or previous.version == schedule.version:
+            return
+
+        changes = diff_schedules(previous, schedule)
+        if not changes:
+            return
+        self.stats["changes"] += 1
+        logger.info(f"Расписание группы {key[0]} изменилось: {len(changes)} изменений")
+        try:
+            self._queue.put_nowait((key, split_message(format_changes(key[0], changes))))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.warning(f"Очередь уведомлений переполнена, изменения группы {key[0]} не разосланы")
+
+    async def subscribe(self, chat_id: int, key: Key, schedule: Schedule) -> bool:
+        # Текущая версия становится точкой отсчёта для следующего сравнения
+        self._previous.setdefault(key, schedule)
+        self.scheduler.pin(key)
+        return await self.store.add(chat_id, key)
+
+    async def unsubscribe(self, chat_id: int, key: Key) -> bool:
+        removed = await self.store.remove(chat_id, key)
+        if key not in self.store:
+            self._previous.pop(key, None)
+            self.scheduler.unpin(key)
+        return removed
+
+    async def _deliver(self, bot: Bot, chats: Iterator[int], key: Key, parts: Parts):
+        for chat_id in chats:
+            try:
+                await sender.send_parts(chat_id, parts, lambda part, chat_id=chat_id: bot.send_message(chat_id, part))
+                self.stats["notifications"] += 1
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                if isinstance(e, TelegramBadRequest) and "chat not found" not in str(e):
+                    self.stats["failed"] += 1
+                    logger.error(f"Не удалось отправить уведомление в чат {chat_id}: {e}")
+                    continue
+                # Бот заблокирован или чат удалён: подписка больше не нужна
+                logger.info(f"Чат {chat_id} недоступен ({e}), удаляем подписку на {key[0]}")
+                self.stats["unsubscribed"] += 1
+                await self.unsubscribe(chat_id, key)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Не удалось отправить уведомление в чат {chat_id}: {e}")
+
+    async def _fan_out(self, bot: Bot, key: Key, parts: Parts):
+        subscribers = self.store.subscribers(key)
+        # Несколько обработчиков разбирают один общий итератор чатов
+        chats = iter(subscribers)
+        workers = min(self.concurrency, len(subscribers))
+        await asyncio.gather(*(self._deliver(bot, chats, key, parts) for _ in range(workers)))
+        logger.info(f"Уведомление об изменениях группы {key[0]} отправлено {len(subscribers)} подписчикам")
+
+    async def run(self, bot: Bot):
+        """
+        Основной цикл рассылки. Работает до отмены задачи.
+        """
+        logger.info("Запущена рассылка изменений расписания")
+        while True:
+            key, parts = await self._queue.get()
+            try:
+                await self._fan_out(bot, key, parts)
+            finally:
+                self._queue.task_done()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            **self.stats,
+            "subscriptions": len(self.store),
+            "groups": len(self.store.groups()),
+            "queued": self._queue.qsize(),
+        }
+
+
+subscriptions = SubscriptionStore()
+notifier = ChangeNotifier(subscriptions, prefetcher, snapshots=snapshot_store if SNAPSHOT_ENABLED else None)
+schedule_cache.add_listener(notifier.on_schedule)
+REGISTRY.stats("schedule_notifications", "Статистика подписок и рассылки изменений", notifier.get_stats)
@@ -0,0 +1,75 @@
+import logging
+from datetime import date
+from typing import Tuple
+
+from api.metrics import REGISTRY, FORMAT_LATENCY
+from api.models import Schedule
+from api.schedule import format_schedule, EMPTY_SCHEDULE
+from config.settings import WEEK_DAYS, RENDER_CACHE_SIZE
+from utils.cache import DailyCache
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4000
+
+Parts = Tuple[str, ...]
+
+
+def split_message(text: str, header: str = "", max_length: int = MAX_MESSAGE_LENGTH) -> Parts:
+    """
+    Делит текст на части не длиннее max_length по границам строк.
+    Первая часть начинается с заголовка header.
+    """
+    parts = []
+    current = [header] if header else []
+    current_length = len(header)
+    for line in text.split("\n"):
+        if current_length + len(line) + 1 <= max_length:
+            current.append(line)
+            current.append("\n")
+            current_length += len(line) + 1
+        else:
+            parts.append("".join(current))
+            current = [line, "\n"]
+            current_length = len(line) + 1
+    if current:
+        parts.append("".join(current))
+    return tuple(parts)
+
+
+# Пометка для расписания, показанного из снимка, пока сайт недоступен
+STALE_NOTICE = "⚠️ Сайт расписания сейчас недоступен, показана последняя сохранённая версия.\n\n"
+
+
+# Готовые части сообщения с расписанием на день. Ключ включает версию расписания,
+# поэтому записи перестают совпадать при любом его изменении
+render_cache: "DailyCache[Parts]" = DailyCache(RENDER_CACHE_SIZE)
+REGISTRY.stats("schedule_render_cache", "Статистика кэша готовых сообщений", render_cache.stats)
+
+
+def render_day(schedule: Schedule, group: str, day_num: str) -> Parts:
+    """
+    Возвращает готовые к отправке части сообщения с расписанием группы на день.
+    """
+    today = date.today()
+    key = (group, day_num, today, schedule.version, schedule.stale)
+    parts = render_cache.get(key, today)
+    if parts is not None:
+        return parts
+
+    day_name = WEEK_DAYS.get(day_num, f"День {day_num}")
+    with FORMAT_LATENCY.time():
+        formatted_schedule = format_schedule(schedule, selected_day=day_num)
+        if not formatted_schedule or formatted_schedule == EMPTY_SCHEDULE:
+            parts = (f"На {day_name} нет актуальных пар для группы {group}.",)
+            if schedule.stale:
+                parts = (STALE_NOTICE + parts[0],)
+        else:
+            header = f"📅 {day_name} (группа {group}):\n\n"
+            if schedule.stale:
+                header = STALE_NOTICE + header
+            parts = split_message(formatted_schedule, header=header)
+    logger.debug("rendered group=%s day=%s parts=%d", group, day_num, len(parts))
+
+    render_cache.set(key, parts, today)
+    return parts
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Sequence, TypeVar
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from api.metrics import REGISTRY, SEND_LATENCY
+from api.ratelimit import RateLimiter
+from config.settings import SEND_GLOBAL_RPS, SEND_CHAT_RPS, SEND_CHAT_BURST, SEND_MAX_RETRIES
+from utils.locks import KeyedLock
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class MessageSender:
+    """
+    Единая точка отправки сообщений в Telegram.
+    Ограничивает частоту отправки в каждый чат и в сумме по всем чатам
+    (token bucket), при TelegramRetryAfter ждёт указанное время и повторяет.
+    Отправки в один чат выполняются строго по очереди, поэтому части
+    длинного расписания всегда приходят в правильном порядке.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = SEND_GLOBAL_RPS,
+        chat_rate: float = SEND_CHAT_RPS,
+        chat_burst: int = SEND_CHAT_BURST,
+        max_retries: int = SEND_MAX_RETRIES,
+        max_chats: int = 10000,
+    ):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.max_chats = max_chats
+        self._global = RateLimiter(global_rate, max(1, int(global_rate)))
+        self._chat_limiters: "OrderedDict[int, RateLimiter]" = OrderedDict()
+        # Очередь отправок в каждый чат
+        self._chat_turns = KeyedLock()
+        self.stats = {"sent": 0, "retry_after": 0, "failed": 0}
+
+    def _chat_limiter(self, chat_id: int) -> RateLimiter:
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            limiter = RateLimiter(self.chat_rate, self.chat_burst)
+            self._chat_limiters[chat_id] = limiter
+            while len(self._chat_limiters) > self.max_chats:
+                self._chat_limiters.popitem(last=False)
+        else:
+            self._chat_limiters.move_to_end(chat_id)
+        return limiter
+
+    async def _call(self, chat_id: int, method: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            await self._chat_limiter(chat_id).acquire()
+            await self._global.acquire()
+            try:
+                with SEND_LATENCY.time():
+                    result = await method()
+                self.stats["sent"] += 1
+                return result
+            except TelegramRetryAfter as e:
+                self.stats["retry_after"] += 1
+                attempt += 1
+                if attempt > self.max_retries:
+                    self.stats["failed"] += 1
+                    raise
+                logger.warning(f"Флуд-контроль Telegram для чата {chat_id}: ждём {e.retry_after} с")
+                await asyncio.sleep(e.retry_after)
+
+    async def send(self, chat_id: int, method: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет один вызов Bot API (например, lambda: message.reply(text)) в очереди чата.
+        """
+        async with self._chat_turns.hold(chat_id):
+            return await self._call(chat_id, method)
+
+    async def send_parts(
+        self,
+        chat_id: int,
+        parts: Sequence[str],
+        send_one: Callable[[str], Awaitable[T]],
+    ) -> List[T]:
+        """
+        Отправляет части сообщения по порядку, не пропуская вперёд другие отправки в этот чат.
+        """
+        results = []
+        async with self._chat_turns.hold(chat_id):
+            for part in parts:
+                results.append(await self._call(chat_id, lambda part=part: send_one(part)))
+        return results
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "queued_chats": len(self._chat_turns)}
+
+
+sender = MessageSender()
+REGISTRY.stats("telegram_sender", "Статистика очереди отправки сообщений", sender.get_stats)
@@ -0,0 +1,74 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from config.settings import FSM_STORAGE, FSM_SQLITE_PATH, REDIS_URL
+from utils.sqlite import SQLiteDatabase
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    FSM-хранилище в локальной базе SQLite: состояние переживает перезапуск,
+    а память процесса не растёт с числом пользователей.
+    """
+
+    def __init__(self, path: str = FSM_SQLITE_PATH, key_builder: Optional[KeyBuilder] = None):
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+        self.db = SQLiteDatabase(
+            path,
+            "CREATE TABLE IF NOT EXISTS fsm (key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL DEFAULT '{}')",
+            thread_name="fsm-sqlite",
+        )
+
+    def _get(self, column: str, key: str) -> Optional[str]:
+        row = self.db.fetchone(f"SELECT {column} FROM fsm WHERE key = ?", (key,))
+        return row[0] if row else None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        await self.db.run(
+            self.db.execute,
+            "INSERT INTO fsm (key, state) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET state = excluded.state",
+            (self.key_builder.build(key), state),
+        )
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return await self.db.run(self._get, "state", self.key_builder.build(key))
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        raw = json.dumps(data, ensure_ascii=False)
+        await self.db.run(
+            self.db.execute,
+            "INSERT INTO fsm (key, data) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET data = excluded.data",
+            (self.key_builder.build(key), raw),
+        )
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        raw = await self.db.run(self._get, "data", self.key_builder.build(key))
+        return json.loads(raw) if raw else {}
+
+    async def close(self) -> None:
+        await self.db.close()
+
+
+def create_storage(backend: str = FSM_STORAGE) -> BaseStorage:
+    """
+    Создаёт FSM-хранилище по имени: memory, sqlite или redis.
+    """
+    if backend == "memory":
+        return MemoryStorage()
+    if backend == "sqlite":
+        logger.info(f"FSM хранится в SQLite: {FSM_SQLITE_PATH}")
+        return SQLiteStorage(FSM_SQLITE_PATH)
+    if backend == "redis":
+        # Для этого варианта нужен пакет redis (pip install redis)
+        from aiogram.fsm.storage.redis import RedisStorage
+        logger.info("FSM хранится в Redis")
+        return RedisStorage.from_url(REDIS_URL)
+    raise ValueError(f"Неизвестное хранилище FSM: {backend}")
@@ -2,45 +2,111 @@ import sys
 import os
 import logging
 import asyncio
-from aiogram import Bot, Dispatcher
-from aiogram.filters import Command
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
+from contextlib import asynccontextmanager, suppress
+from datetime import date
+from typing import Optional
+from aiogram import Bot, Dispatcher, F
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.filters import Command, CommandObject
+from aiogram.types import (
+    Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, InlineQuery,
+)
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 # Проверяем путь
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 try:
-    from api.schedule import fetch_schedule, format_schedule
+    from api.schedule import get_schedule, prefetcher
+    from api.client import close_client
+    from api.metrics import start_metrics_server
+    from api.search import InvertedIndex, schedule_index, format_matches
+    from api.groups import group_catalog
+    from api.snapshots import snapshot_store
+    from api.resilience import CircuitOpenError
+    from api.shared import shared_backend, shared_schedules
+    from bot.render import render_day, split_message, Parts
+    from bot.storage import create_storage
+    from bot.callbacks import DayCallback, NavCallback, LEGACY_DAY_PREFIX, TODAY
+    from bot.sender import sender
+    from bot.notifications import notifier, subscriptions
+    from bot.inline import answer_inline
 except ModuleNotFoundError as e:
     print(f"Ошибка импорта: {e}")
     raise
-from config.settings import TELEGRAM_TOKEN, WEEK_DAYS
+from config.settings import (
+    TELEGRAM_TOKEN, WEEK_DAYS, PREFETCH_ENABLED, LOG_LEVEL, METRICS_HOST, METRICS_PORT,
+    NAVIGATION_MODE, WORKERS, TELEGRAM_API_URL,
+)
 
 # Настройка логирования
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
 # Инициализация бота и диспетчера с явным хранилищем FSM
-bot = Bot(token=TELEGRAM_TOKEN)
-storage = MemoryStorage()
+api_session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+bot = Bot(token=TELEGRAM_TOKEN, session=api_session)
+storage = create_storage()
 dp = Dispatcher(storage=storage)
 
 # Определяем состояния для FSM
 class ScheduleForm(StatesGroup):
     waiting_for_group = State()
 
-def create_day_buttons() -> InlineKeyboardMarkup:
+DAY_NUMS = list(WEEK_DAYS)
+
+def resolve_day(day: str) -> str:
+    """
+    Превращает TODAY в номер текущего дня недели (в воскресенье — понедельник).
+    """
+    if day != TODAY:
+        return day
+    weekday = str(date.today().isoweekday())
+    return weekday if weekday in WEEK_DAYS else DAY_NUMS[0]
+
+def shift_day(day_num: str, step: int) -> str:
+    index = DAY_NUMS.index(day_num) if day_num in DAY_NUMS else 0
+    return DAY_NUMS[(index + step) % len(DAY_NUMS)]
+
+def create_nav_buttons(group: str, session: str = "0", current_day: Optional[str] = None) -> InlineKeyboardMarkup:
+    """
+    Клавиатура навигации по неделе: предыдущий/следующий день, сегодня и все дни.
+    """
+    def button(text: str, day: str) -> InlineKeyboardButton:
+        return InlineKeyboardButton(
+            text=text,
+            callback_data=NavCallback(group=group, day=day, session=session).pack()
+        )
+
+    if current_day:
+        rows = [[
+            button("◀", shift_day(current_day, -1)),
+            button("Сегодня", TODAY),
+            button("▶", shift_day(current_day, 1)),
+        ]]
+    else:
+        rows = [[button("Сегодня", TODAY)]]
+    days = [
+        button(f"• {day_name}" if day_num == current_day else day_name, day_num)
+        for day_num, day_name in WEEK_DAYS.items()
+    ]
+    rows.extend(days[i:i + 2] for i in range(0, len(days), 2))
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+def create_day_buttons(group: str, session: str = "0") -> InlineKeyboardMarkup:
+    if NAVIGATION_MODE == "edit":
+        return create_nav_buttons(group, session)
+
     keyboard = InlineKeyboardMarkup(inline_keyboard=[])
     for day_num, day_name in WEEK_DAYS.items():
         button = InlineKeyboardButton(
             text=day_name,
-            callback_data=f"day_{day_num}"
+            callback_data=DayCallback(group=group, day=day_num, session=session).pack()
         )
         keyboard.inline_keyboard.append([button])
     return keyboard
@@ -56,7 +122,9 @@ async def start(message: Message):
         f"Привет, {user.first_name}! 👋\n"
         "Я бот, который поможет тебе узнать расписание Московского Политеха.\n"
         "Используй команду /schedule, чтобы ввести номер группы, или /schedule [группа] для быстрого запроса.\n"
-        "Пример: /чепопарам 241-335"
+        "Пример: /чепопарам 241-335\n"
+        "Найти преподавателя или аудиторию: /препод Иванов, /аудитория Пр2301\n"
+        "Получать изменения расписания: /подписка 241-335"
     )
 
 @dp.message(Command("чепопарам"))
@@ -74,6 +142,79 @@ async def schedule(message: Message, state: FSMContext):
         await message.reply("Пожалуйста, введи номер группы (например, 241-335):")
         await state.set_state(ScheduleForm.waiting_for_group)
 
+@dp.message(Command("препод"))
+async def teacher_search(message: Message, command: CommandObject):
+    """
+    Обработчик команды /препод: где преподаватель сейчас и на этой неделе.
+    """
+    await search(message, command.args, schedule_index.teachers, "👨‍🏫",
+                 "Укажи фамилию преподавателя (например, /препод Иванов).")
+
+@dp.message(Command("аудитория"))
+async def room_search(message: Message, command: CommandObject):
+    """
+    Обработчик команды /аудитория: какие занятия идут в аудитории.
+    """
+    await search(message, command.args, schedule_index.locations, "📍",
+                 "Укажи номер аудитории (например, /аудитория Пр2301).")
+
+@dp.message(Command("подписка"))
+async def subscribe(message: Message, command: CommandObject, state: FSMContext):
+    """
+    Обработчик команды /подписка: присылать изменения расписания группы.
+    Без аргумента подписывает на последнюю запрошенную группу.
+    """
+    group = (command.args or "").strip() or (await state.get_data()).get("group")
+    if not group:
+        current = ", ".join(key[0] for key in subscriptions.chat_groups(message.chat.id))
+        await message.reply(
+            f"Ты подписан на группы: {current}" if current
+            else "Укажи номер группы (например, /подписка 241-335)."
+        )
+        return
+    if not group.replace("-", "").isdigit():
+        await message.reply("Номер группы должен содержать только цифры и дефис (например, 241-335).")
+        return
+
+    try:
+        schedule_data = await get_schedule(group=group, session="0")
+    except Exception as e:
+        logger.error(f"Ошибка при получении расписания для группы {group}: {e}")
+        await message.reply("Произошла ошибка при получении расписания. Попробуй позже.")
+        return
+    if not schedule_data.ok:
+        await message.reply(f"Группа {group} не найдена.")
+        return
+
+    await notifier.subscribe(message.chat.id, (group, "0"), schedule_data)
+    await message.reply(
+        f"🔔 Буду присылать изменения расписания группы {group}.\n"
+        f"Отписаться: /отписка {group}"
+    )
+
+@dp.message(Command("отписка"))
+async def unsubscribe(message: Message, command: CommandObject):
+    """
+    Обработчик команды /отписка: без аргумента отписывает от всех групп.
+    """
+    group = (command.args or "").strip()
+    keys = [(group, "0")] if group else subscriptions.chat_groups(message.chat.id)
+    removed = [key[0] for key in keys if await notifier.unsubscribe(message.chat.id, key)]
+    if removed:
+        await message.reply(f"Больше не присылаю изменения для групп: {', '.join(removed)}")
+    else:
+        await message.reply("Подписок не найдено.")
+
+async def search(message: Message, query: Optional[str], index: InvertedIndex, title: str, usage: str):
+    """
+    Отвечает на поисковый запрос из индекса по загруженным расписаниям, без запросов к API.
+    """
+    if not query or not query.strip():
+        await message.reply(usage)
+        return
+    text = format_matches(index, query.strip(), title)
+    await sender.send_parts(message.chat.id, split_message(text), message.reply)
+
 @dp.message(ScheduleForm.waiting_for_group)
 async def process_group(message: Message, state: FSMContext):
     """
@@ -91,93 +232,182 @@ async def process_schedule(message: Message, group: str, state: FSMContext):
             await message.reply("Номер группы должен содержать только цифры и дефис (например, 241-335).")
             return
 
-        schedule_data = fetch_schedule(group=group, session="0")
-        logger.info(f"Расписание успешно получено через API для группы {group}.")
-        logger.info(f"Контекст: user_id={message.from_user.id}, chat_id={message.chat.id}")
+        schedule_data = await get_schedule(group=group, session="0")
+        logger.debug("schedule_ready group=%s user_id=%s chat_id=%s", group, message.from_user.id, message.chat.id)
 
-        await state.update_data(schedule_data=schedule_data, group=group)
-        logger.info(f"Данные сохранены в FSM: group={group}, schedule_data_keys={list(schedule_data.keys())}")
+        if not schedule_data.ok:
+            text = f"Группа {group} не найдена."
+            suggestions = group_catalog.suggest(group)
+            if suggestions:
+                text += f" Возможно, ты имел в виду: {', '.join(suggestions)}"
+            await message.reply(text)
+            return
 
-        if not schedule_data.get("grid"):
+        if schedule_data.is_empty:
             await message.reply("Не удалось найти расписание для этой группы.")
             return
 
-        await message.reply(
+        # В FSM храним только ссылку на группу: само расписание лежит в общем кэше
+        await state.update_data(group=group, session="0", version=schedule_data.version)
+
+        await sender.send(message.chat.id, lambda: message.reply(
             f"Выбери день недели для группы {group}:",
-            reply_markup=create_day_buttons()
-        )
+            reply_markup=create_day_buttons(group)
+        ))
 
+    except CircuitOpenError:
+        await message.reply("Сайт расписания сейчас недоступен. Попробуй через пару минут.")
     except Exception as e:
         logger.error(f"Ошибка при получении расписания для группы {group}: {e}")
         await message.reply("Произошла ошибка при получении расписания. Попробуй позже.")
 
-@dp.callback_query(lambda c: c.data.startswith("day_"))
-async def process_day_selection(callback: CallbackQuery, state: FSMContext):
+@dp.callback_query(DayCallback.filter())
+async def process_day_selection(callback: CallbackQuery, callback_data: DayCallback):
     """
     Обработчик нажатия на кнопку дня недели.
+    Группа и день берутся из самой кнопки, FSM не нужен.
     """
+    await send_day(callback, callback_data.group, callback_data.session, callback_data.day)
+
+@dp.callback_query(F.data.startswith(LEGACY_DAY_PREFIX))
+async def process_legacy_day_selection(callback: CallbackQuery, state: FSMContext):
+    """
+    Обработчик кнопок старого формата "day_{num}": группа берётся из FSM.
+    """
+    day_num = callback.data[len(LEGACY_DAY_PREFIX):]
+    user_data = await state.get_data()
+    logger.debug("Извлечены данные из FSM: %s", user_data)
+    group = user_data.get("group")
+
+    if not group:
+        logger.warning("Группа не найдена в FSM")
+        await callback.message.reply("Группа не указана. Пожалуйста, запроси расписание заново с помощью /schedule.")
+        await callback.answer()
+        return
+
+    await send_day(callback, group, user_data.get("session", "0"), day_num)
+
+@dp.callback_query(NavCallback.filter())
+async def process_day_navigation(callback: CallbackQuery, callback_data: NavCallback):
+    """
+    Обработчик кнопок навигации: расписание показывается в том же сообщении.
+    """
+    day_num = resolve_day(callback_data.day)
+    await show_day(callback, callback_data.group, callback_data.session, day_num)
+
+async def load_day(callback: CallbackQuery, group: str, session: str, day_num: str) -> Optional[Parts]:
+    """
+    Возвращает части сообщения с расписанием на день или None, если расписание получить не удалось.
+    """
+    logger.debug("day_selected group=%s day=%s user_id=%s chat_id=%s",
+                 group, day_num, callback.from_user.id, callback.message.chat.id)
     try:
-        day_num = callback.data.split("_")[1]
-        day_name = WEEK_DAYS.get(day_num, f"День {day_num}")
-
-        logger.info(f"Контекст: user_id={callback.from_user.id}, chat_id={callback.message.chat.id}")
-        user_data = await state.get_data()
-        logger.info(f"Извлечены данные из FSM: {user_data}")
-        schedule_data = user_data.get("schedule_data")
-        group = user_data.get("group")
-
-        if not group:
-            logger.warning("Группа не найдена в FSM")
-            await callback.message.reply("Группа не указана. Пожалуйста, запроси расписание заново с помощью /schedule.")
-            await callback.answer()
+        schedule_data = await get_schedule(group=group, session=session)
+    except Exception as e:
+        logger.error(f"Ошибка повторного запроса расписания для группы {group}: {e}")
+        await callback.message.reply("Не удалось обновить расписание. Попробуй запросить заново с помощью /schedule.")
+        await callback.answer()
+        return None
+    return render_day(schedule_data, group, day_num)
+
+async def send_day(callback: CallbackQuery, group: str, session: str, day_num: str):
+    """
+    Отправляет расписание группы на выбранный день новыми сообщениями.
+    """
+    try:
+        parts = await load_day(callback, group, session, day_num)
+        if parts is None:
             return
 
-        if not schedule_data:
-            logger.warning(f"Данные расписания отсутствуют для группы {group}, запрашиваем заново")
-            try:
-                schedule_data = fetch_schedule(group=group, session="0")
-                await state.update_data(schedule_data=schedule_data, group=group)
-                logger.info(f"Расписание успешно получено повторно для группы {group}")
-            except Exception as e:
-                logger.error(f"Ошибка повторного запроса расписания для группы {group}: {e}")
-                await callback.message.reply("Не удалось обновить расписание. Попробуй запросить заново с помощью /schedule.")
-                await callback.answer()
-                return
-
-        formatted_schedule = format_schedule(schedule_data, selected_day=day_num)
-        logger.info(f"Расписание отформатировано для группы {group}, день {day_name}.")
-
-        if not formatted_schedule or formatted_schedule == "Расписание пустое.":
-            await callback.message.reply(f"На {day_name} нет актуальных пар для группы {group}.")
+        # Отвечаем на callback сразу, чтобы у пользователя не крутились "часики"
+        await callback.answer()
+
+        try:
+            await sender.send_parts(callback.message.chat.id, parts, callback.message.reply)
+        except TelegramBadRequest as e:
+            logger.error(f"Ошибка отправки части сообщения: {e}")
+            await callback.message.reply("Ошибка при отправке расписания. Попробуй позже.")
+
+    except Exception as e:
+        logger.error(f"Ошибка при обработке выбора дня: {e}")
+        await callback.message.reply("Произошла ошибка. Попробуй позже.")
+        # callback мог быть уже отвечен до ошибки
+        with suppress(TelegramBadRequest):
             await callback.answer()
-            return
 
-        max_length = 4000
-        parts = []
-        current_part = f"📅 {day_name} (группа {group}):\n\n"
-        for line in formatted_schedule.split("\n"):
-            if len(current_part) + len(line) + 1 <= max_length:
-                current_part += line + "\n"
-            else:
-                parts.append(current_part)
-                current_part = line + "\n"
-        if current_part:
-            parts.append(current_part)
-
-        for part in parts:
-            try:
-                await callback.message.reply(part)
-            except TelegramBadRequest as e:
-                logger.error(f"Ошибка отправки части сообщения: {e}")
-                await callback.message.reply("Ошибка при отправке расписания. Попробуй позже.")
-                return
+async def show_day(callback: CallbackQuery, group: str, session: str, day_num: str):
+    """
+    Показывает расписание на день, редактируя сообщение с клавиатурой навигации.
+    Если текст не изменился, сообщение не трогаем; если не помещается
+    в одно сообщение — отправляем частями, как в режиме reply.
+    """
+    try:
+        parts = await load_day(callback, group, session, day_num)
+        if parts is None:
+            return
 
         await callback.answer()
+        chat_id = callback.message.chat.id
+        message = callback.message
+
+        # Сообщение старше 48 часов недоступно для редактирования
+        if len(parts) > 1 or not isinstance(message, Message):
+            await sender.send_parts(chat_id, parts, lambda part: callback.bot.send_message(chat_id, part))
+            return
+
+        text = parts[0]
+        if message.text and message.text.strip() == text.strip():
+            logger.debug("Расписание не изменилось, сообщение не редактируем")
+            return
+
+        markup = create_nav_buttons(group, session, day_num)
+        try:
+            await sender.send(chat_id, lambda: message.edit_text(text, reply_markup=markup))
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                raise
 
     except Exception as e:
         logger.error(f"Ошибка при обработке выбора дня: {e}")
         await callback.message.reply("Произошла ошибка. Попробуй позже.")
-        await callback.answer()
+        with suppress(TelegramBadRequest):
+            await callback.answer()
+
+@dp.inline_query()
+async def inline_schedule(inline_query: InlineQuery):
+    """
+    Inline-режим: «@bot 241-335 пт» в любом чате. Пока номер группы не дописан —
+    автодополнение по каталогу, затем расписание на день из кэша.
+    """
+    await answer_inline(inline_query)
+
+@asynccontextmanager
+async def background_services(shard: int = 0, shards: int = 1):
+    """
+    Фоновые задачи и ресурсы процесса бота: рассылка изменений, фоновое обновление,
+    метрики. При нескольких процессах shard — номер процесса, метрики слушают METRICS_PORT + shard.
+    """
+    group_catalog.load()
+    await notifier.load(shard, shards)
+    tasks = [asyncio.create_task(notifier.run(bot))]
+    if PREFETCH_ENABLED:
+        tasks.append(asyncio.create_task(prefetcher.run()))
+    metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT + shard) if METRICS_PORT else None
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await close_client()
+        await storage.close()
+        await subscriptions.close()
+        await snapshot_store.close()
+        if shared_schedules is not None:
+            await shared_schedules.close()
+        await shared_backend.close()
+        group_catalog.save()
+        if metrics_runner:
+            await metrics_runner.cleanup()
 
 async def main():
     """
@@ -188,7 +418,12 @@ async def main():
         sys.exit(1)
 
     logger.info("Запускаем Telegram-бота...")
-    await dp.start_polling(bot)
+    async with background_services():
+        await dp.start_polling(bot)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if WORKERS > 1:
+        from bot.workers import run_workers
+        run_workers(dp, bot, WORKERS)
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+Запуск бота в нескольких процессах.
+
+Главный процесс получает обновления от Telegram (long polling) и раскладывает их
+по очередям процессов-обработчиков по chat_id, поэтому все сообщения одного чата
+обрабатывает один процесс строго по порядку, а FSM чата живёт в одном месте.
+Кэш расписаний и лимит запросов к rasp.dmami.ru процессы делят через SHARED_BACKEND.
+
+    WORKERS=4 SHARED_BACKEND=redis python -m bot.workers
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+from typing import List
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from utils.locks import KeyedLock
+
+logger = logging.getLogger(__name__)
+
+# Сколько обновлений может ждать в очереди одного процесса
+QUEUE_SIZE = 1000
+
+
+def shard_key(update: Update) -> int:
+    """
+    Ключ распределения: chat_id для сообщений и кнопок, id пользователя для inline-запросов.
+    """
+    if update.callback_query is not None and update.callback_query.message is not None:
+        return update.callback_query.message.chat.id
+    event = update.event
+    chat = getattr(event, "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else 0
+
+
+def shard_of(update: Update, shards: int) -> int:
+    return shard_key(update) % shards
+
+
+async def process_updates(queue, dp: Dispatcher, bot: Bot):
+    """
+    Читает обновления из очереди процесса, пока не придёт None.
+    """
+    loop = asyncio.get_running_loop()
+    # Обновления разных чатов обрабатываются параллельно, одного чата — по очереди
+    chats = KeyedLock()
+    tasks = set()
+
+    async def handle(update: Update):
+        async with chats.hold(shard_key(update)):
+            try:
+                await dp.feed_update(bot, update)
+            except Exception as e:
+                logger.error(f"Ошибка обработки обновления {update.update_id}: {e}")
+
+    while True:
+        raw = await loop.run_in_executor(None, queue.get)
+        if raw is None:
+            break
+        update = Update.model_validate_json(raw, context={"bot": bot})
+        task = asyncio.create_task(handle(update))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run_worker(shard: int, shards: int, queue):
+    from bot import telegram_bot as app
+
+    logger.info(f"Обработчик {shard + 1}/{shards} запущен (pid {os.getpid()})")
+    try:
+        async with app.background_services(shard, shards):
+            await process_updates(queue, app.dp, app.bot)
+    finally:
+        await app.bot.session.close()
+    logger.info(f"Обработчик {shard + 1}/{shards} остановлен")
+
+
+def worker_main(shard: int, shards: int, queue):
+    # Остановкой управляет главный процесс: он присылает None в очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(run_worker(shard, shards, queue))
+
+
+def start_worker(context, shard: int, shards: int, queue) -> multiprocessing.Process:
+    process = context.Process(target=worker_main, args=(shard, shards, queue), name=f"bot-worker-{shard}")
+    process.start()
+    return process
+
+
+async def poll_updates(dp: Dispatcher, bot: Bot, queues: List, processes: List, context, timeout: int = 30):
+    """
+    Long polling в главном процессе: каждое обновление уходит в очередь своего обработчика.
+    Упавший обработчик перезапускается с той же очередью.
+    """
+    loop = asyncio.get_running_loop()
+    allowed_updates = dp.resolve_used_update_types()
+    offset = None
+    failures = 0
+    while True:
+        for shard, process in enumerate(processes):
+            if not process.is_alive():
+                logger.error(f"Обработчик {shard + 1} завершился (код {process.exitcode}), перезапускаем")
+                processes[shard] = start_worker(context, shard, len(queues), queues[shard])
+
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=timeout, allowed_updates=allowed_updates)
+            failures = 0
+        except Exception as e:
+            failures += 1
+            logger.error(f"Ошибка получения обновлений: {e}")
+            await asyncio.sleep(min(30, 2 ** failures))
+            continue
+
+        for update in updates:
+            offset = update.update_id + 1
+            raw = update.model_dump_json(exclude_unset=True)
+            # put блокируется, если обработчик не успевает: это и есть обратное давление
+            await loop.run_in_executor(None, queues[shard_of(update, len(queues))].put, raw)
+
+
+def run_workers(dp: Dispatcher, bot: Bot, workers: int):
+    """
+    Запускает workers процессов-обработчиков и получение обновлений в текущем процессе.
+    """
+    # Процессы-обработчики делят лимит запросов к сайту по числу процессов
+    os.environ["WORKERS"] = str(workers)
+    context = multiprocessing.get_context("spawn")
+    queues = [context.Queue(maxsize=QUEUE_SIZE) for _ in range(workers)]
+    processes = [start_worker(context, shard, workers, queue) for shard, queue in enumerate(queues)]
+    logger.info(f"Запущено обработчиков: {workers}")
+
+    async def front():
+        try:
+            await bot.delete_webhook()
+            await poll_updates(dp, bot, queues, processes, context)
+        finally:
+            await bot.session.close()
+
+    try:
+        asyncio.run(front())
+    except KeyboardInterrupt:
+        logger.info("Останавливаем обработчики...")
+    finally:
+        for queue in queues:
+            queue.put(None)
+        for process in processes:
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бот расписания в нескольких процессах")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию WORKERS или число ядер)")
+    args = parser.parse_args()
+
+    from bot import telegram_bot as app
+    from config.settings import TELEGRAM_TOKEN, WORKERS
+
+    if not TELEGRAM_TOKEN:
+        logger.error("TELEGRAM_TOKEN не задан в .env файле.")
+        sys.exit(1)
+    workers = args.workers or (WORKERS if WORKERS > 1 else os.cpu_count() or 1)
+    run_workers(app.dp, app.bot, workers)
+
+
+if __name__ == "__main__":
+    main()
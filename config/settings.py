@@ -4,7 +4,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-BASE_URL = "https://rasp.dmami.ru/"
+# Адрес Bot API (например, локальный telegram-bot-api); по умолчанию api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+BASE_URL = os.getenv("SCHEDULE_BASE_URL", "https://rasp.dmami.ru/")
 API_URL = f"{BASE_URL}site/group"
 GROUP = "241-335"
 SESSION = "0"
@@ -32,4 +34,100 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",
     "Accept": "application/json, text/plain, */*",
     "Referer": BASE_URL,
-}
\ No newline at end of file
+}
+
+# Параметры асинхронного HTTP-клиента для rasp.dmami.ru
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+# Кэш расписаний: время жизни записи (сек) и максимальное число групп
+SCHEDULE_CACHE_TTL = float(os.getenv("SCHEDULE_CACHE_TTL", "900"))
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", "2000"))
+
+# Как долго (сек) переиспользовать куки с главной страницы rasp.dmami.ru
+COOKIE_MAX_AGE = float(os.getenv("COOKIE_MAX_AGE", "3600"))
+
+# Общий лимит запросов к rasp.dmami.ru (запросов в секунду и размер всплеска)
+UPSTREAM_RPS = float(os.getenv("UPSTREAM_RPS", "5"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "10"))
+
+# Фоновое обновление расписаний активных групп
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_INTERVAL = float(os.getenv("PREFETCH_INTERVAL", "30"))  # период проверки, сек
+PREFETCH_AHEAD = float(os.getenv("PREFETCH_AHEAD", "180"))  # за сколько до истечения TTL обновлять, сек
+PREFETCH_JITTER = float(os.getenv("PREFETCH_JITTER", "15"))  # случайная задержка перед обновлением, сек
+PREFETCH_ACTIVE_WINDOW = float(os.getenv("PREFETCH_ACTIVE_WINDOW", "21600"))  # группа активна, если её запрашивали за это время
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "3"))
+PREFETCH_RPS = float(os.getenv("PREFETCH_RPS", "1"))  # доля общего лимита для фоновых запросов
+PREFETCH_MAX_BACKOFF = float(os.getenv("PREFETCH_MAX_BACKOFF", "1800"))  # наибольшая пауза после ошибок обновления группы, сек
+
+# Кэш готовых к отправке сообщений с расписанием на день
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "5000"))
+
+# Каталог для локальных данных бота (FSM, снимки расписаний и т.п.)
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+# Хранилище FSM: memory, sqlite или redis
+FSM_STORAGE = os.getenv("FSM_STORAGE", "sqlite")
+FSM_SQLITE_PATH = os.getenv("FSM_SQLITE_PATH", os.path.join(DATA_DIR, "fsm.sqlite3"))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Уровень логирования (DEBUG включает подробные логи запросов)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# HTTP-эндпоинт метрик Prometheus (/metrics); 0 — выключен
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+# Лимиты отправки сообщений в Telegram (сообщений в секунду)
+SEND_GLOBAL_RPS = float(os.getenv("SEND_GLOBAL_RPS", "25"))
+SEND_CHAT_RPS = float(os.getenv("SEND_CHAT_RPS", "1"))
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+
+# Режим показа расписания по кнопкам дней:
+# edit — одно сообщение с навигацией редактируется на месте, reply — каждый день новым сообщением
+NAVIGATION_MODE = os.getenv("NAVIGATION_MODE", "edit")
+
+# Каталог известных групп (снимок для автодополнения) и кэш несуществующих групп
+GROUP_CATALOG_PATH = os.getenv("GROUP_CATALOG_PATH", os.path.join(DATA_DIR, "groups.json"))
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "600"))
+NEGATIVE_CACHE_SIZE = int(os.getenv("NEGATIVE_CACHE_SIZE", "10000"))
+
+
+# Подписки на изменения расписания: база подписчиков, очередь и параллельность рассылки
+SUBSCRIPTIONS_PATH = os.getenv("SUBSCRIPTIONS_PATH", os.path.join(DATA_DIR, "subscriptions.sqlite3"))
+NOTIFY_QUEUE_SIZE = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+NOTIFY_CONCURRENCY = int(os.getenv("NOTIFY_CONCURRENCY", "20"))
+
+# Снимки расписаний на диске: тёплый старт и показ сохранённой версии, когда сайт недоступен
+SNAPSHOT_ENABLED = os.getenv("SNAPSHOT_ENABLED", "1") == "1"
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(DATA_DIR, "snapshots.sqlite3"))
+STALE_TIMEOUT = float(os.getenv("STALE_TIMEOUT", "3"))  # сколько ждать сайт, прежде чем показать снимок, сек
+STALE_TTL = float(os.getenv("STALE_TTL", "60"))  # сколько держать снимок в кэше до повторной проверки, сек
+
+# Устойчивость к сбоям rasp.dmami.ru: таймауты по наблюдаемой задержке, повторы, предохранитель
+UPSTREAM_MIN_TIMEOUT = float(os.getenv("UPSTREAM_MIN_TIMEOUT", "2"))  # нижняя граница адаптивного таймаута, сек
+UPSTREAM_TIMEOUT_FACTOR = float(os.getenv("UPSTREAM_TIMEOUT_FACTOR", "2"))  # таймаут = p99 задержки * коэффициент
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.3"))
+UPSTREAM_BACKOFF_CAP = float(os.getenv("UPSTREAM_BACKOFF_CAP", "3"))
+UPSTREAM_HEDGE = os.getenv("UPSTREAM_HEDGE", "1") == "1"  # дублировать запрос, если он дольше p95
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))  # ошибок подряд до размыкания
+BREAKER_RECOVERY = float(os.getenv("BREAKER_RECOVERY", "30"))  # через сколько пробовать снова, сек
+
+# Несколько процессов-обработчиков: обновления делятся между ними по chat_id.
+# Кэш расписаний и лимит запросов к сайту общие через SHARED_BACKEND (local — только внутри процесса)
+WORKERS = int(os.getenv("WORKERS", "1"))
+SHARED_BACKEND = os.getenv("SHARED_BACKEND", "local")
+SHARED_REDIS_URL = os.getenv("SHARED_REDIS_URL", REDIS_URL)
+# Inline-режим (@bot 241-335 пт): сколько Telegram кэширует ответ, пауза перед загрузкой
+# расписания, которого нет в кэше (пока пользователь печатает), и сколько ждать эту загрузку, сек
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE", "0.3"))
+INLINE_LOAD_WAIT = float(os.getenv("INLINE_LOAD_WAIT", "2"))
+# Сколько готовых наборов inline-ответов (группа, день, версия) держать в памяти
+INLINE_RESULTS_CACHE_SIZE = int(os.getenv("INLINE_RESULTS_CACHE_SIZE", "2000"))
\ No newline at end of file
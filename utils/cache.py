@@ -0,0 +1,48 @@
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class DailyCache(Generic[V]):
+    """
+    LRU-кэш готовых ответов, действующих только в течение дня (они зависят
+    от сегодняшней даты). Записи прошлых дней удаляются целиком при первой
+    смене даты.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._date: Optional[date] = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _check_date(self, today: date):
+        if self._date != today:
+            self._entries.clear()
+            self._date = today
+
+    def get(self, key: Hashable, today: date) -> Optional[V]:
+        self._check_date(today)
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V, today: date):
+        self._check_date(today)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
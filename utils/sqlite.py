@@ -0,0 +1,62 @@
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class SQLiteDatabase:
+    """
+    Локальная база SQLite, все обращения к которой идут через один отдельный поток,
+    чтобы не блокировать цикл событий и не делить соединение между потоками.
+    Файл и таблица (schema) создаются при первом обращении.
+    """
+
+    def __init__(self, path: str, schema: str, thread_name: str):
+        self.path = path
+        self.schema = schema
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=thread_name)
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Соединение с базой; вызывается только из потока базы (внутри run).
+        """
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(self.schema)
+            self._conn.commit()
+        return self._conn
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def execute(self, sql: str, params: tuple = ()):
+        """
+        Выполняет изменяющий запрос и фиксирует его (в потоке базы).
+        """
+        conn = self.connect()
+        conn.execute(sql, params)
+        conn.commit()
+
+    def fetchone(self, sql: str, params: tuple = ()) -> Optional[tuple]:
+        return self.connect().execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: tuple = ()) -> list:
+        return self.connect().execute(sql, params).fetchall()
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        await self.run(self._close)
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Coroutine, Set
+
+
+class BackgroundTasks:
+    """
+    Фоновые задачи «запустил и забыл» (например, запись свежей версии расписания
+    из обработчика кэша), которые нужно дождаться при остановке.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine) -> bool:
+        """
+        Запускает задачу в текущем цикле событий. Вне цикла (например, в бенчмарках,
+        где кэш заполняется синхронно) задача не нужна и просто отбрасывается.
+        """
+        try:
+            task = asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()
+            return False
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def wait(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)